@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Throughput benchmarks of the generator scripts on synthetic inputs.
+
+Measures packets/s and MB/s of generate_packet and save_to_file_packet for
+every built-in structure, entities/s of script_testbench.generate_testbench
+on generated entities of 10 to 10k ports, and files/s and MB/s of
+doxyfile_code_extraction.main on a generated source tree. Every input is
+built from --seed in a temporary directory, so runs are reproducible.
+
+Results are written as JSON. With a baseline file (see --save-baseline)
+every metric is compared against it and the run fails when one dropped by
+more than --tolerance.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+
+import packet_registry
+import script_testbench
+import doxyfile_code_extraction
+import generate_data_for_testbench
+
+DEFAULT_OUTPUT = 'benchmark_results.json'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+PORT_COUNTS = (10, 100, 1000, 10000)
+PORTS_PER_SIZE = 20000 # Total ports generated per entity size
+PACKET_COUNT = 2000
+TREE_FILES = 400
+TREE_FILE_LINES = 400
+QUICK_SCALE = 10 # --quick divides the input sizes by this
+
+#### Timing ####
+def best_time(function, setup=None, repeat=3):
+    """Best wall time in seconds of function() over repeat runs, output silenced."""
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def rate(amount, seconds):
+    return amount / seconds if seconds > 0 else float('inf')
+
+#### Packet generator ####
+def bench_packets(work_dir, count, repeat):
+    results = {}
+    for structure in packet_registry.load_registry().values():
+        manual_values = {field: '0' * structure['fields'][field] for field in structure['manual_fields']}
+        packet_bytes = structure['total_bits'] / 8
+        packets = []
+
+        def generate():
+            packets[:] = [generate_data_for_testbench.generate_packet(structure, index, manual_values) for index in range(count)]
+
+        filename = os.path.join(work_dir, 'packets.txt')
+
+        def remove_file():
+            if os.path.exists(filename):
+                os.remove(filename)
+
+        def save():
+            for packet_data in packets:
+                generate_data_for_testbench.save_to_file_packet(packet_data, filename)
+
+        seconds = best_time(generate, repeat=repeat)
+        results[f"generate_packet/{structure['name']}"] = {
+            'packets/s': rate(count, seconds),
+            'MB/s': rate(count * packet_bytes / 1e6, seconds),
+        }
+        seconds = best_time(save, setup=remove_file, repeat=repeat)
+        results[f"save_to_file_packet/{structure['name']}"] = {
+            'packets/s': rate(count, seconds),
+            'MB/s': rate(os.path.getsize(filename) / 1e6, seconds),
+        }
+    return results
+
+#### Testbench generator ####
+PORT_TYPES = (
+    ('in', 'std_logic'),
+    ('out', 'std_logic_vector(7 downto 0)'),
+    ('in', 'unsigned(15 downto 0)'),
+    ('out', 'signed(DATA_WIDTH - 1 downto 0)'),
+    ('in', 'integer range 0 to 255'),
+    ('out', 'boolean'),
+)
+
+def synthetic_entity(name, port_count, rng):
+    """VHDL source of an entity with port_count ports of mixed standard types."""
+    ports = []
+    for index in range(port_count):
+        mode, data_type = PORT_TYPES[rng.randrange(len(PORT_TYPES))]
+        ports.append(f"        p_{index} : {mode} {data_type}")
+    return (
+        "library ieee;\n"
+        "use ieee.std_logic_1164.all;\n"
+        "use ieee.numeric_std.all;\n\n"
+        f"entity {name} is\n"
+        "    generic (\n"
+        "        DATA_WIDTH : integer := 32;\n"
+        "        DEPTH : natural := 16\n"
+        "    );\n"
+        "    port (\n"
+        "        clk : in std_logic;\n"
+        "        rst : in std_logic;\n"
+        + ";\n".join(ports) + "\n"
+        "    );\n"
+        f"end entity {name};\n\n"
+        f"architecture rtl of {name} is\n"
+        "begin\n"
+        "end architecture rtl;\n"
+    )
+
+def bench_testbench(work_dir, ports_per_size, repeat, seed):
+    results = {}
+    rng = random.Random(seed)
+    for port_count in PORT_COUNTS:
+        source_dir = os.path.join(work_dir, f'vhdl_{port_count}')
+        output_dir = os.path.join(source_dir, script_testbench.SIMULATION_DIR)
+        os.makedirs(source_dir)
+        files = []
+        for index in range(max(1, ports_per_size // port_count)):
+            name = f"entity_{port_count}_{index}"
+            files.append(os.path.join(source_dir, name + '.vhd'))
+            with open(files[-1], 'w') as f:
+                f.write(synthetic_entity(name, port_count, rng))
+
+        def clean_output():
+            shutil.rmtree(output_dir, ignore_errors=True)
+            os.makedirs(output_dir)
+
+        def generate():
+            for vhdl_filename in files:
+                script_testbench.generate_testbench(vhdl_filename, output_dir=output_dir)
+
+        seconds = best_time(generate, setup=clean_output, repeat=repeat)
+        results[f"script_testbench/{port_count}_ports"] = {
+            'entities/s': rate(len(files), seconds),
+            'ports/s': rate(len(files) * (port_count + 2), seconds),
+        }
+    return results
+
+#### TODO extractor ####
+def synthetic_tree(root, file_count, line_count, rng):
+    """Source tree mixing plain code lines with custom TODO blocks. Returns its size in bytes."""
+    total = 0
+    for index in range(file_count):
+        directory = os.path.join(root, f"dir_{index % 20}")
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        while len(lines) < line_count:
+            if rng.random() < 0.05:
+                lines.append(f"{doxyfile_code_extraction.start_pattern} Block {len(lines)}")
+                lines.append(f"{doxyfile_code_extraction.comment_pattern} reviewed value {rng.getrandbits(32)}")
+                lines.append(f"signal_{len(lines)} <= '1';")
+                lines.append(doxyfile_code_extraction.end_pattern)
+            else:
+                lines.append(f"    signal_{len(lines)} <= signal_{rng.randrange(1000)} and enable; -- plain code")
+        data = '\n'.join(lines) + '\n'
+        with open(os.path.join(directory, f"file_{index}.vhd"), 'w') as f:
+            f.write(data)
+        total += len(data)
+    return total
+
+def bench_extraction(work_dir, file_count, line_count, repeat, seed):
+    tree = os.path.join(work_dir, 'tree')
+    tree_bytes = synthetic_tree(tree, file_count, line_count, random.Random(seed))
+    cache_file = os.path.join(work_dir, 'todos_cache.json')
+
+    def extract_uncached():
+        doxyfile_code_extraction.main(tree, cache_file=None)
+
+    def extract_cached():
+        doxyfile_code_extraction.main(tree, cache_file=cache_file)
+
+    results = {}
+    seconds = best_time(extract_uncached, repeat=repeat)
+    results['doxyfile_code_extraction/uncached'] = {'files/s': rate(file_count, seconds), 'MB/s': rate(tree_bytes / 1e6, seconds)}
+    extract_cached() # Fill the cache
+    seconds = best_time(extract_cached, repeat=repeat)
+    results['doxyfile_code_extraction/cached'] = {'files/s': rate(file_count, seconds), 'MB/s': rate(tree_bytes / 1e6, seconds)}
+    return results
+
+#### Baseline comparison ####
+def compare(results, baseline, tolerance):
+    """Lines describing every metric against the baseline, and the list of regressions."""
+    lines = []
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(name, {}).get(metric)
+            if not reference:
+                lines.append(f"{name} {metric}: {value:.1f} (no baseline)")
+                continue
+            change = value / reference - 1
+            flag = ''
+            if change < -tolerance:
+                flag = '  REGRESSION'
+                regressions.append(f"{name} {metric}")
+            lines.append(f"{name} {metric}: {value:.1f} vs {reference:.1f} ({change:+.1%}){flag}")
+    return lines, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generator, testbench writer and TODO extractor.")
+    parser.add_argument("--only", choices=['packets', 'testbench', 'extraction'], action='append', help="Run only these benchmarks (repeatable).")
+    parser.add_argument("--quick", action='store_true', help=f"Inputs {QUICK_SCALE} times smaller, for a fast check.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best one is kept.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic inputs and the packet generator.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON file receiving the results.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON results to compare against.")
+    parser.add_argument("--save-baseline", action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative slowdown reported as a regression.")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be positive")
+
+    scale = QUICK_SCALE if args.quick else 1
+    selected = args.only or ['packets', 'testbench', 'extraction']
+    output = os.path.abspath(args.output)
+    baseline_file = os.path.abspath(args.baseline)
+
+    random.seed(args.seed)
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='benchmark_') as work_dir:
+        # custom_todos.dox and the packet files are written to the working directory
+        os.chdir(work_dir)
+        try:
+            if 'packets' in selected:
+                results.update(bench_packets(work_dir, PACKET_COUNT // scale, args.repeat))
+            if 'testbench' in selected:
+                results.update(bench_testbench(work_dir, PORTS_PER_SIZE // scale, args.repeat, args.seed))
+            if 'extraction' in selected:
+                results.update(bench_extraction(work_dir, TREE_FILES // scale, TREE_FILE_LINES, args.repeat, args.seed))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'metadata': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'quick': args.quick,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    regressions = []
+    if os.path.exists(baseline_file) and not args.save_baseline:
+        with open(baseline_file, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('metadata', {}).get('quick') != args.quick:
+            print("Warning: baseline and results were measured with different input sizes")
+        lines, regressions = compare(results, baseline.get('results', {}), args.tolerance)
+        print('\n'.join(lines))
+    else:
+        for name, metrics in results.items():
+            print(f"{name}: " + ', '.join(f"{value:.1f} {metric}" for metric, value in metrics.items()))
+    if args.save_baseline:
+        shutil.copyfile(output, baseline_file)
+        print(f"Baseline saved to {baseline_file}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: " + ', '.join(regressions))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,280 @@
 #!/usr/bin/env python3
 
 import os
-import sys
+import argparse
+import mmap
+import fnmatch
+from concurrent.futures import ProcessPoolExecutor
+
+import instrumentation
+import json_store
+from file_watcher import PollingWatcher
+
+OUTPUT_FILE = 'custom_todos.dox'
+DEFAULT_CACHE_FILE = '.custom_todos_cache.json'
+CACHE_VERSION = 2
+
+#Define start and end patterns
+start_pattern = "--/#?"
+end_pattern = "--?#/"
+comment_pattern = "--Comment"
+
+BINARY_SNIFF_BYTES = 8192
+
+def has_markers(file_path):
+    """Cheap pre-check: False for empty or binary files and files without any marker.
+
+    The whole file is searched as bytes through mmap, so files without markers
+    (logs, waveform dumps) are rejected without decoding or splitting lines.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if b'\0' in mm[:BINARY_SNIFF_BYTES]:
+                return False
+            # An end marker alone never produces a block
+            return mm.find(start_pattern.encode()) != -1 or mm.find(comment_pattern.encode()) != -1
 
 def extract_custom_content(file_path):
     """Extract content from a file based on custom comment delimiters."""
     extracted_blocks = []
+    if not has_markers(file_path):
+        return extracted_blocks
+
+    in_block = False
+    block_content = []
     with open(file_path,'r',errors='replace') as f: #errors='replace' helps in reading files with non-UTF-8 characters
-        lines = f.readlines()
+        for line in f: # Lines are read lazily so memory stays flat on large files
+            if start_pattern in line and not in_block:
+                in_block = True
+                continue #skip the start pattern line
 
-    #Define start and end patterns
-    start_pattern = "--/#?"
-    end_pattern = "--?#/"
+            if end_pattern in line and in_block:
+                in_block = False
+                extracted_blocks.append(''.join(block_content).strip())
+                block_content = []
+                continue # Skip the end pattern line
 
-    in_block = False
-    block_content =""
-    for line in lines:
-        if start_pattern in line and not in_block:
-            in_block = True
-            continue #skip the start pattern line
-
-        if end_pattern in line and in_block:
-            in_block = False
-            extracted_blocks.append(block_content.strip())
-            block_content = ""
-            continue # Skip the end pattern line
-
-        if in_block:
-            block_content+= line
-        elif "--Comment" in line:
-            comment_start = line.find("--Comment") + len("--Comment")
-            comment_content = line[comment_start:].strip()
-            extracted_blocks.append("-"+ comment_content)
+            if in_block:
+                block_content.append(line)
+            elif comment_pattern in line:
+                comment_start = line.find(comment_pattern) + len(comment_pattern)
+                comment_content = line[comment_start:].strip()
+                extracted_blocks.append("-"+ comment_content)
 
     return extracted_blocks
 
-def main(directory):
-    # Clear or create the customs.dox file at the beginning and add the header
+#### Persistent cache of extracted blocks, keyed by path + mtime + size ######
+def load_cache(cache_file):
+    return json_store.load_versioned(cache_file, CACHE_VERSION)
+
+def save_cache(cache_file, files):
+    json_store.save_versioned(cache_file, CACHE_VERSION, files)
+
+def matches_any(file_path, patterns):
+    """True if the base name or the path of file_path matches one of the glob patterns."""
+    name = os.path.basename(file_path)
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(file_path, pattern) for pattern in patterns)
+
+def collect_files(directory, skip=(), include=None, exclude=None):
+    """Walk directory and return every file path in sorted order, so output is byte-stable.
+
+    Only files matching an include glob are kept (all files if include is empty).
+    Files and directories matching an exclude glob are skipped; excluded
+    directories are not walked at all.
+    """
+    file_paths = []
+    for root, dirs,files in os.walk(directory):
+        if exclude:
+            dirs[:] = [d for d in dirs if not matches_any(os.path.join(root, d), exclude)]
+        for file in files:
+            file_path = os.path.join(root,file)
+            if include and not matches_any(file_path, include):
+                continue
+            if exclude and matches_any(file_path, exclude):
+                continue
+            if os.path.realpath(file_path) not in skip:
+                file_paths.append(file_path)
+    file_paths.sort()
+    return file_paths
+
+def scan_file(file_path):
+    """Blocks of file_path, or None when it was deleted or renamed before it could be read."""
+    try:
+        return extract_custom_content(file_path)
+    except OSError:
+        return None
+
+def file_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+def scan_files(file_paths, cache=None, new_cache=None, jobs=1):
+    """Return the extracted blocks of every file, in the order of file_paths.
+
+    When new_cache is given, files whose mtime and size match their cache entry
+    are not re-read and the entries for this run are recorded in new_cache.
+    Dirty files are scanned in a process pool when jobs > 1. Files that
+    disappeared since they were listed get None and no cache entry.
+    """
+    results = [None] * len(file_paths)
+    dirty = []
+    for index, file_path in enumerate(file_paths):
+        if new_cache is not None:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            entry = cache.get(file_path)
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                results[index] = entry['blocks']
+                new_cache[file_path] = entry
+                continue
+            new_cache[file_path] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'blocks': None}
+        dirty.append(index)
+
+    dirty_paths = [file_paths[index] for index in dirty]
+    if instrumentation.active:
+        instrumentation.count('files from cache', len(file_paths) - len(dirty_paths))
+        instrumentation.count('bytes read', sum(file_size(file_path) for file_path in dirty_paths))
+    if jobs > 1 and len(dirty_paths) > 1:
+        chunksize = max(1, len(dirty_paths) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            scanned = list(executor.map(scan_file, dirty_paths, chunksize=chunksize))
+    else:
+        scanned = [scan_file(file_path) for file_path in dirty_paths]
+
+    for index, blocks in zip(dirty, scanned):
+        results[index] = blocks
+        if new_cache is not None:
+            if blocks is None:
+                new_cache.pop(file_paths[index], None)
+            else:
+                new_cache[file_paths[index]]['blocks'] = blocks
+    return results
+
+def write_blocks(output_file, extracted_contents):
+    for content in extracted_contents:
+        if content.startswith("-"): # Single line comment
+            cleaned_content = content[2:].lstrip() # Remove "- " prefix and all leading whitespaces
+            output_file.write("* "+ "- " + cleaned_content + "\n")
+        else: # This is a block content
+            output_file.write("* \\code{.vhd}\n")
+            for line in content.split('\n'):
+                if line.strip(): #If its not an empty line
+                    output_file.write("* "+ line + "\n")
+                else:
+                    output_file.write("*\n")
+            output_file.write("* \\endcode\n")
+
+def write_dox(results, output_path=OUTPUT_FILE):
     header = """/*! \page customtodos Custom To-Do List
 *
 *\n"""
-    with open('custom_todos.dox', 'w') as f:
-        f.write(header)
+    # Write the header, every block and the closing tag through one buffered handle
+    with open(output_path, 'w') as output_file:
+        output_file.write(header)
+        for extracted_contents in results:
+            write_blocks(output_file, extracted_contents)
+        output_file.write("*/\n")
 
-    # Iterate through all files in the given directory
-    for root, _,files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root,file)
-            extracted_contents = extract_custom_content(file_path)
-            if extracted_contents:
-                with open('custom_todos.dox','a') as output_file:
-                    for content in extracted_contents:
-                        if content.startswith("-"): # Single line comment
-                            cleaned_content = content[2:].lstrip() # Remove "- " prefix and all leading whitespaces
-                            output_file.write("* "+ "- " + cleaned_content + "\n")
-                        else: # This is a block content
-                            output_file.write("* \\code{.vhd}\n")
-                            for line in content.split('\n'):
-                                if line.strip(): #If its not an empty line
-                                    output_file.write("* "+ line + "\n")
-                                else:
-                                    output_file.write("*\n")   
-                            output_file.write("* \\endcode\n")
-    
-    # Append the closing tag for the header
-    with open('custom_todos.dox','a') as f:
-        f.write("*/\n")
+def skip_paths(cache_file):
+    # Never scan our own output or cache, they contain the extracted markers
+    skip = {os.path.realpath(OUTPUT_FILE)}
+    if cache_file:
+        skip.update({os.path.realpath(cache_file), os.path.realpath(cache_file + json_store.TMP_SUFFIX)})
+    return skip
+
+def main(directory, cache_file=DEFAULT_CACHE_FILE, jobs=1, include=None, exclude=None):
+    with instrumentation.phase('load cache'):
+        cache = load_cache(cache_file)
+    new_cache = {} if cache_file else None
+
+    with instrumentation.phase('walk'):
+        file_paths = collect_files(directory, skip_paths(cache_file), include, exclude)
+    with instrumentation.phase('scan'):
+        # Files deleted during the scan are left out, as if they were never listed
+        results = [blocks for blocks in scan_files(file_paths, cache, new_cache, jobs) if blocks is not None]
+    with instrumentation.phase('write'):
+        write_dox(results)
+
+    # Entries of deleted files are dropped by only saving what this run saw;
+    # a run where every file was a cache hit leaves the cache file alone
+    if cache_file and new_cache != cache:
+        with instrumentation.phase('save cache'):
+            save_cache(cache_file, new_cache)
+    if instrumentation.active:
+        instrumentation.count('files walked', len(file_paths))
+        instrumentation.count('blocks extracted', sum(len(blocks) for blocks in results))
+        instrumentation.count('bytes written', os.path.getsize(OUTPUT_FILE))
+
+def watch(directory, cache_file=DEFAULT_CACHE_FILE, jobs=1, include=None, exclude=None, interval=0.2):
+    """Keep the extracted blocks in memory and rewrite custom_todos.dox when files change.
+
+    Only changed files are re-scanned; the output is identical to a full run.
+    """
+    skip = skip_paths(cache_file)
+    cache = load_cache(cache_file)
+    new_cache = {}
+
+    def list_files():
+        return collect_files(directory, skip, include, exclude)
+
+    file_paths = list_files()
+    blocks = {file_path: extracted_contents for file_path, extracted_contents
+              in zip(file_paths, scan_files(file_paths, cache, new_cache, jobs)) if extracted_contents is not None}
+    write_dox(blocks[path] for path in sorted(blocks))
+    if cache_file and new_cache != cache:
+        save_cache(cache_file, new_cache)
+    saved_cache = dict(new_cache)
+    print(f"Watching {directory} ({len(blocks)} files), press Ctrl+C to stop.")
+
+    for changed, removed in PollingWatcher(list_files, interval).changes():
+        modified = False
+        for file_path in removed:
+            new_cache.pop(file_path, None)
+            if blocks.pop(file_path, None):
+                modified = True
+        changed_paths = sorted(changed)
+        for file_path, extracted_contents in zip(changed_paths, scan_files(changed_paths, {}, new_cache, jobs)):
+            if extracted_contents is None:
+                # Deleted or renamed since the poll (atomic save, checkout): same as removed
+                if blocks.pop(file_path, None):
+                    modified = True
+                continue
+            if blocks.get(file_path) != extracted_contents:
+                modified = True
+            blocks[file_path] = extracted_contents
+        if modified:
+            write_dox(blocks[path] for path in sorted(blocks))
+            print(f"{OUTPUT_FILE} updated ({len(changed)} changed, {len(removed)} removed).")
+        if cache_file and new_cache != saved_cache:
+            save_cache(cache_file, new_cache)
+            saved_cache = dict(new_cache)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: script_name.py <directory_path>")
-        sys.exit(1)
-    directory_path = sys.argv[1]
-    main(directory_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract custom To-Do blocks into custom_todos.dox.")
+    parser.add_argument("directory_path", help="Directory to scan.")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_FILE, help="Cache file of already extracted blocks.")
+    parser.add_argument("--no-cache", action="store_true", help="Re-scan every file and do not update the cache.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes used to scan files.")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB", help="Only scan files matching GLOB (repeatable), e.g. '*.vhd'.")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB", help="Skip files and directories matching GLOB (repeatable), e.g. '*.ghw'.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and update custom_todos.dox when files change.")
+    parser.add_argument("--interval", type=float, default=0.2, help="Polling interval in seconds for --watch.")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be positive")
+    cache_file = None if args.no_cache else args.cache
+    if args.watch:
+        try:
+            watch(args.directory_path, cache_file, args.jobs, args.include, args.exclude, args.interval)
+        except KeyboardInterrupt:
+            pass
+    else:
+        with instrumentation.profiling(args):
+            main(args.directory_path, cache_file, args.jobs, args.include, args.exclude)
\ No newline at end of file
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Polling file watcher shared by the watch modes of the generator scripts.
+
+Files are compared by (mtime, size) snapshots, so no platform specific
+notification API is needed. Bursts of changes (editor save, git checkout)
+are debounced into one batch.
+"""
+
+import os
+import time
+
+def snapshot(file_paths):
+    """Map each existing path to its (mtime, size) stamp."""
+    stamps = {}
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue # Deleted between listing and stat
+        stamps[file_path] = (st.st_mtime_ns, st.st_size)
+    return stamps
+
+def diff_snapshots(old, new):
+    """Return (changed or added paths, removed paths) between two snapshots."""
+    changed = {path for path, stamp in new.items() if old.get(path) != stamp}
+    removed = set(old) - set(new)
+    return changed, removed
+
+class PollingWatcher:
+    """Yield debounced batches of file changes.
+
+    list_files is called on every poll and returns the paths to watch, so new
+    files are picked up. A batch is reported once no further change has been
+    seen for `debounce` seconds.
+    """
+
+    def __init__(self, list_files, interval=0.2, debounce=0.3):
+        self.list_files = list_files
+        self.interval = interval
+        self.debounce = debounce
+        self.stamps = snapshot(list_files())
+
+    def poll(self):
+        new = snapshot(self.list_files())
+        changed, removed = diff_snapshots(self.stamps, new)
+        self.stamps = new
+        return changed, removed
+
+    def changes(self):
+        while True:
+            time.sleep(self.interval)
+            changed, removed = self.poll()
+            if not changed and not removed:
+                continue
+            last_change = time.monotonic()
+            while time.monotonic() - last_change < self.debounce:
+                time.sleep(self.interval)
+                more_changed, more_removed = self.poll()
+                if more_changed or more_removed:
+                    last_change = time.monotonic()
+                    # A file re-created after deletion counts as changed
+                    removed = (removed | more_removed) - more_changed
+                    changed = (changed - more_removed) | more_changed
+            yield changed, removed
@@ -4,27 +4,107 @@ import random
 import argparse
 import os
 import logging
+import logging.handlers
+import queue
+import zlib
+import hashlib
+import importlib
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import instrumentation
+import packet_file
+import packet_registry
+import stimulus_server
+from packet_codec import Packet, PacketLayout
+from stimulus_engine import StimulusEngine, MAX_STALLED_PACKETS
 
 def int_to_bin(value, size):
     """Convert an integer to a binary string of specified size."""
     return format(value, f'0{size}b')
 
+def random_bits(size, rng=random):
+    """Return a random binary string of specified size drawn as one packed integer."""
+    if size <= 0:
+        return ''
+    return int_to_bin(rng.getrandbits(size), size)
+
+def derive_seed(seed, index):
+    """Derive an independent, deterministic seed for stream `index` of a run."""
+    digest = hashlib.sha256(f"{seed}:{index}".encode()).digest()
+    return int.from_bytes(digest, 'big')
+
 def log_metadata(metadata):
     logging.info("Metadata:")
     for key, value in metadata.items():
-        logging.info(f"{key}: {value}")
+        logging.info("%s: %s", key, value)
 
 def log_generated_data(data,name):
-    logging.info(f"Generated {name} data:")
+    logging.info("Generated %s data:", name)
     for size, values in data.items():
         for value in values:
-            logging.info(f"{size}-bit: {value}")
+            logging.info("%d-bit: %s", size, value)
 
 def log_generated_data_packet(data,name):
-    logging.info(f"Generated {name} data:")
+    logging.info("Generated %s data:", name)
     for field, values in data.items():
-        values_concatenated =''.join(values)
-        logging.info(f"{field}: {values_concatenated}")
+        logging.info("%s: %s", field, values)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats each record before queueing it. Our log
+    arguments are ints, strings and CrcList objects that are never changed
+    after logging, so the record can be queued as is.
+    """
+
+    def prepare(self, record):
+        return record
+
+class CrcList:
+    """CRC-32 values of a chunk, joined to hex only when the listener formats the record."""
+    __slots__ = ('crcs',)
+
+    def __init__(self, crcs):
+        self.crcs = crcs
+
+    def __str__(self):
+        return ' '.join(format(crc, '08x') for crc in self.crcs)
+
+def setup_logging(filename='output.log'):
+    """Log to filename from a background thread; returns the listener to stop at exit."""
+    handler = logging.FileHandler(filename, mode='w')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    listener.start()
+    return listener
+
+def log_packet_chunks(chunks, log_mode, first_offset, stride, sample=1000):
+    """Pass bulk chunks through unchanged while logging them.
+
+    summary: one line per chunk with the byte offset of its first packet and the
+    CRC-32 of every packet (packet i starts at first_offset + i * stride).
+    sampled: additionally the bits of every `sample`-th packet. full: the bits of
+    every packet. Formatting happens lazily in the logging thread.
+    """
+    index = 0
+    for lines in chunks:
+        crcs = [zlib.crc32(line.encode('ascii')) for line in lines]
+        logging.info("Packets %d-%d at offset %d, crc32: %s", index, index + len(lines) - 1,
+                     first_offset + index * stride, CrcList(crcs))
+        if log_mode == 'full':
+            for i, line in enumerate(lines, start=index):
+                logging.info("Packet %d: %s", i, line)
+        elif log_mode == 'sampled':
+            for i in range(-index % sample, len(lines), sample):
+                logging.info("Packet %d: %s", index + i, lines[i])
+        index += len(lines)
+        yield lines
 
 def generate_data(manual, sizes):
     data = {}
@@ -45,18 +125,19 @@ def generate_data(manual, sizes):
             data[size].append(int_to_bin(value_int, size))
     else:
         for size in sizes:
-            data_value = ''.join(random.choice(['0', '1']) for _ in range(size))
-            data[size].append(data_value)
+            data[size].append(random_bits(size))
 
     return data
 
-def choose_packet_structure():
-    packet_structures = [
-        {'name': 'Integrity Frame G1G RCC', 'fields' : {'Service Descriptor':2, 'Galileo Global Region Status':8, 'Integrity Data for Galileo Global Region':150,'EDBS Data':40,'Spare':128}},
-        {'name': 'Message Sub-Frame G1G RCC', 'fields' : {'Data Packet 0':264, 'Data Packet 1':264, 'Data Packet 2':264, 'Data Packet 3':264,'Data Packet 4':264,'Data Packet 5':264,'Spare':200,'Data Packet 6':264,'Data Packet 7':264,'Data Packet 8':264,'Data Packet 9':264,'Data Packet 10':264,'Data Packet 11':264,}},
-        {'name': 'Mission Frame G2G RCC', 'fields' : {'Version No':2,'Spacecraft ID':8,'Virtual Channel ID':6,'VC Frame Count':24,'Replay Flag':1,'VC Frame Count Usage Flag':1,'Spare':2,'VC Frame Count Cycle':4,'VCA SDU':3616},'manual_fields':['Version No']},
-        # Add more data structures
-    ]
+def choose_packet_structure(packet_structures=None, name=None):
+    """Pick a structure from the registry, by name when given, otherwise interactively."""
+    if packet_structures is None:
+        packet_structures = packet_registry.load_registry()
+    if name is not None:
+        chosen_structure = packet_registry.find_structure(packet_structures, name)
+        print(f"Chosen structure: {chosen_structure['name']}")
+        return chosen_structure
+    packet_structures = list(packet_structures.values())
 
     print("Available packet structures:")
     for i, structure in enumerate(packet_structures, start=1):
@@ -74,25 +155,277 @@ def choose_packet_structure():
                 print ("Invalid Choice. Try again.")
         except ValueError:
             print("Invalid input. Please enter a number.")
-        
-def generate_packet(structure):
+
+def counter_value(spec, index, size):
+    return (spec['start'] + spec['step'] * index) % (1 << size)
+
+def manual_field_values(structure, assignments=None):
+    """Binary values of the manual fields, taken from --set FIELD=VALUE or asked for once.
+
+    Raises ValueError for a value that does not fit in its field.
+    """
+    given = {}
+    for assignment in assignments or []:
+        field, _, value = assignment.partition('=')
+        given[field.strip()] = value.strip()
+    manual_values = {}
+    for field in structure.get('manual_fields', []):
+        value = given.get(field)
+        if value is None:
+            value = input(f"Enter {field}: ")
+        width = structure['fields'][field]
+        try:
+            number = packet_registry.parse_value(value)
+        except ValueError:
+            raise ValueError(f"'{field}': invalid value '{value}'") from None
+        if not 0 <= number < 1 << width:
+            raise ValueError(f"'{field}' is {width} bits wide, {value} does not fit")
+        manual_values[field] = int_to_bin(number, width)
+    return manual_values
+
+def generate_packet(structure, index=0, manual_values=None):
+    """Generate one packet; index is the packet number used by counter fields."""
     print(f"Generating {structure['name']} packet...")
     
     packet_data = {}
 
     manual_fields = structure.get('manual_fields',[])
+    policies = structure.get('policies', {})
     for field, size in structure['fields'].items():
-        if manual_fields and field in structure['manual_fields']:
+        policy = policies.get(field, {}).get('policy', 'random')
+        if manual_values and field in manual_values:
+            packet_data[field] = manual_values[field]
+        elif manual_fields and field in structure['manual_fields']:
             # Manually input field
             user_input = input(f"Enter {field}: ")
             packet_data[field] = int_to_bin(int(user_input),size)
+        elif policy == 'fixed':
+            packet_data[field] = int_to_bin(policies[field]['value'], size)
+        elif policy == 'counter':
+            packet_data[field] = int_to_bin(counter_value(policies[field], index, size), size)
         else:
             # Randomly generate values for non specified fields
-            data_value = ''.join(random.choice(['0','1']) for _ in range(size))
-            packet_data[field] = data_value
+            packet_data[field] = random_bits(size)
 
     return packet_data
 
+def packet_overrides(structure, manual_values):
+    """Wire-line slices replaced by manual, fixed and counter field values.
+
+    Returns (total bits, [(start, end, reversed bits or None, counter spec or None)]).
+    """
+    offsets = structure.get('offsets')
+    if offsets is None:
+        # Plain structure dicts: the wire line is the reverse of the concatenated
+        # fields, so a field at logical offset `offset` occupies
+        # [total - offset - size, total - offset).
+        total_bits = sum(structure['fields'].values())
+        offsets = []
+        offset = 0
+        for field, size in structure['fields'].items():
+            offsets.append((field, offset, size, total_bits - offset - size))
+            offset += size
+    else:
+        total_bits = structure['total_bits']
+
+    policies = structure.get('policies', {})
+    overrides = []
+    for field, _, size, start in offsets:
+        policy = policies.get(field, {})
+        if manual_values and field in manual_values:
+            overrides.append((start, start + size, manual_values[field][::-1], None))
+        elif policy.get('policy') == 'fixed':
+            overrides.append((start, start + size, int_to_bin(policy['value'], size)[::-1], None))
+        elif policy.get('policy') == 'counter':
+            overrides.append((start, start + size, None, (policy['start'], policy['step'], size)))
+    overrides.sort()
+    return total_bits, overrides
+
+def generate_packet_block(total_bits, count, overrides, rng=random, first_index=0):
+    """Generate `count` packet lines from a single packed draw of `rng`.
+
+    first_index is the number of the first packet, used by counter fields.
+    """
+    bits = random_bits(total_bits * count, rng)
+    lines = []
+    for index, i in enumerate(range(0, total_bits * count, total_bits), start=first_index):
+        line = bits[i:i + total_bits]
+        if overrides:
+            parts = []
+            pos = 0
+            for start, end, value, counter in overrides:
+                if counter is not None:
+                    counter_start, step, size = counter
+                    value = int_to_bin((counter_start + step * index) % (1 << size), size)[::-1]
+                parts.append(line[pos:start])
+                parts.append(value)
+                pos = end
+            parts.append(line[pos:])
+            line = ''.join(parts)
+        lines.append(line)
+    return lines
+
+def _generate_seeded_block(task):
+    # Process pool entry point: each block has its own stream derived from the run seed
+    total_bits, count, overrides, block_seed, first_index = task
+    return generate_packet_block(total_bits, count, overrides, random.Random(block_seed), first_index)
+
+def generate_packets_bulk(structure, count, manual_values=None, chunk_size=1024, seed=None, workers=1):
+    """Yield chunks of packet lines (wire bit order, as written by save_to_file_packet).
+
+    Each chunk of up to chunk_size packets is drawn from a single getrandbits call
+    and sliced, so no Python loop runs per bit. manual_values maps field names to
+    fixed binary strings which are placed at their position in every packet.
+
+    With a seed, chunk i is drawn from its own random.Random(derive_seed(seed, i)),
+    so the output depends only on seed and chunk_size and is bit-identical for
+    any number of workers. Chunks are generated in a process pool when
+    workers > 1 and are always yielded in order. A count of None never ends
+    (server mode).
+    """
+    total_bits, overrides = packet_overrides(structure, manual_values)
+    if count is None:
+        starts = itertools.count(0, chunk_size)
+    else:
+        starts = range(0, count, chunk_size)
+
+    def block_size(first_index):
+        return chunk_size if count is None else min(chunk_size, count - first_index)
+
+    if seed is None:
+        for first_index in starts:
+            yield generate_packet_block(total_bits, block_size(first_index), overrides, random, first_index)
+        return
+
+    tasks = ((total_bits, block_size(first_index), overrides, derive_seed(seed, i), first_index)
+             for i, first_index in enumerate(starts))
+    if workers <= 1:
+        for task in tasks:
+            yield _generate_seeded_block(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded number of chunks in flight so memory does not grow with count
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_generate_seeded_block, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def generate_packets_covered(engine, max_count=None, chunk_size=1024):
+    """Yield chunks of packet lines drawn by a coverage-driven StimulusEngine.
+
+    Generation stops once the coverage goal is met or after max_count packets.
+    The engine steers each packet from the coverage of the previous ones, so
+    this runs in one process.
+    """
+    layout = PacketLayout(engine.structure)
+    offsets = layout.offsets
+    lines = []
+    for values in engine.generate(max_count):
+        value = 0
+        for field, field_value in values.items():
+            shift, _, mask = offsets[field]
+            value |= (field_value & mask) << shift
+        lines.append(Packet(layout, value).to_wire())
+        if len(lines) == chunk_size:
+            yield lines
+            lines = []
+    if lines:
+        yield lines
+
+#### Golden model stage ####
+# Golden models resolved in this process, keyed by their 'module:function' spec
+_golden_models = {}
+
+def load_golden_model(spec):
+    """Import a golden model given as 'module:function'.
+
+    The callable takes the input Packet (packet_codec.py) and returns the
+    expected output as a Packet, of any layout, or as a '0'/'1' wire line.
+    """
+    if spec not in _golden_models:
+        module_name, _, function_name = spec.partition(':')
+        if not function_name:
+            raise ValueError(f"Golden model '{spec}' must be given as module:function")
+        _golden_models[spec] = getattr(importlib.import_module(module_name), function_name)
+    return _golden_models[spec]
+
+def apply_golden_model(task):
+    """Expected wire lines for a chunk of input lines, plus the output layout for binary headers."""
+    spec, structure, lines = task
+    model = load_golden_model(spec)
+    layout = PacketLayout(structure)
+    expected = []
+    output_fields = None
+    for line in lines:
+        result = model(Packet.from_wire(layout, line))
+        if isinstance(result, Packet):
+            output_name, output_fields = result.layout.name, result.layout.fields[::-1]
+            result = result.to_wire()
+        elif isinstance(result, str):
+            output_name, output_fields = f"{structure['name']} expected", [('Expected', len(result))]
+        else:
+            raise TypeError(f"Golden model '{spec}' returned {type(result).__name__}, expected a Packet or a bit string")
+        expected.append(result)
+    return expected, output_name if output_fields else None, output_fields
+
+class ExpectedWriter:
+    """Write expected results in the format of the stimulus file, one per input packet.
+
+    Each run starts a new file; run() starts the stimulus file afresh as well.
+    """
+
+    def __init__(self, filename, file_format='text', byteorder='big'):
+        self.filename = filename
+        self.file_format = file_format
+        self.byteorder = byteorder
+        self.writer = None
+        self.count = 0
+        # A binary PacketWriter would append to a file with the same header
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def write(self, expected, output_name, output_fields):
+        if self.file_format == 'binary':
+            if self.writer is None:
+                header = packet_file.make_header(output_name, output_fields, self.byteorder)
+                self.writer = packet_file.PacketWriter(self.filename, header)
+            self.writer.write_lines(expected)
+        else:
+            if self.writer is None:
+                self.writer = open(self.filename, 'w')
+            self.writer.write(''.join(line + '\n' for line in expected))
+        self.count += len(expected)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def golden_stage(chunks, spec, structure, expected_writer, workers=1):
+    """Pass chunks through unchanged while the golden model runs on them in a process pool.
+
+    Expected results are written in input order, so the stimulus and expected
+    files can be read in lockstep. At most 2 * workers chunks are in flight.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for lines in chunks:
+            pending.append(executor.submit(apply_golden_model, (spec, structure, lines)))
+            yield lines
+            while len(pending) >= workers * 2 or (pending and pending[0].done()):
+                expected_writer.write(*pending.popleft().result())
+        while pending:
+            expected_writer.write(*pending.popleft().result())
+
+def expected_filename_for(structure, file_format):
+    extension = 'bin' if file_format == 'binary' else 'txt'
+    return f"{structure['name']}_expected.{extension}"
+
 #### Function to save the data stream in file #########
 def save_to_file_data(data, filename):
     with open(filename, 'w') as f:
@@ -104,15 +437,72 @@ def save_to_file_data(data, filename):
 #### Function to save packets in the packet name file ########
 def save_to_file_packet(packet_data, filename):
     with open(filename, 'a') as f:
-        reversed_values = [value[::-1] for value in reversed(packet_data.values())]
-        line = ''.join(reversed_values)
-        f.write(line+'\n')
+        f.write(packet_to_wire(packet_data)+'\n')
+
+def packet_to_wire(packet_data):
+    """Wire line of a generate_packet dict (last field first, each field LSB first)."""
+    return ''.join(bits[::-1] for bits in reversed(packet_data.values()))
+
+#### Function to stream bulk packet chunks in the packet name file ########
+def save_to_file_packets(chunks, filename):
+    count = 0
+    with open(filename, 'a') as f:
+        for lines in chunks:
+            with instrumentation.phase('write'):
+                f.write('\n'.join(lines) + '\n')
+            count += len(lines)
+    return count
+
+#### Packed binary variants of the save functions (see packet_file.py) ########
+def save_to_file_data_binary(data, filename, byteorder='big'):
+    fields = []
+    line = []
+    for size, values in data.items():
+        for value in values:
+            fields.append((f"Value {len(fields)} ({size}-bit)", size))
+            line.append(value[::-1])
+    header = packet_file.make_header("Generated Data", fields, byteorder)
+    # Each run holds different sizes, so the data file is rewritten like the text one
+    if os.path.exists(filename):
+        os.remove(filename)
+    with packet_file.PacketWriter(filename, header) as writer:
+        writer.write(''.join(line))
+
+def save_to_file_packet_binary(packet_data, structure, filename, byteorder='big'):
+    with packet_file.PacketWriter(filename, packet_file.packet_header(structure, byteorder)) as writer:
+        writer.write(packet_to_wire(packet_data))
+
+def save_to_file_packets_binary(chunks, structure, filename, byteorder='big'):
+    with packet_file.PacketWriter(filename, packet_file.packet_header(structure, byteorder)) as writer:
+        for lines in chunks:
+            with instrumentation.phase('write'):
+                writer.write_lines(lines)
+        return writer.count
+
+def packet_filename_for(structure, file_format):
+    extension = 'bin' if file_format == 'binary' else 'txt'
+    return f"{structure['name']}_packet.{extension}"
+
+def save_packet(packet_data, structure, filename, args):
+    if args.format == 'binary':
+        save_to_file_packet_binary(packet_data, structure, filename, args.byteorder)
+    else:
+        save_to_file_packet(packet_data, filename)
+
+def packet_file_layout(structure, filename, args):
+    """Byte offset of the next packet written to filename and the size of one packet."""
+    size = os.path.getsize(filename) if os.path.exists(filename) else 0
+    if args.format == 'binary':
+        header = packet_file.packet_header(structure, args.byteorder)
+        return size or len(packet_file.encode_header(header)), header['record_bytes']
+    total_bits = sum(structure['fields'].values())
+    return size, total_bits + 1
 
 #### Meta data infomration/Logging ######
 def log_metadata(metadata):
     logging.info("Metadata:")
     for key, value in metadata.items():
-        logging.info(f"{key}: {value}")
+        logging.info("%s: %s", key, value)
 
 def main():
     parser = argparse.ArgumentParser(description='Generate data for VHDL testbench.')
@@ -120,6 +510,23 @@ def main():
     parser.add_argument('--p', action='store_true', help='Generate packet')
     parser.add_argument('--sizes', nargs='+', type=int, default=[8], help='List of data sizes (bit-widths) to generate data for')
     parser.add_argument('--filename', type=str, default='data_file.txt', help='Output filename for the generated data')  # New argument for filename
+    parser.add_argument('--count', type=int, default=None, help='Generate COUNT packets in bulk (implies --p)')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='Packets generated and written per chunk in bulk mode')
+    parser.add_argument('--format', choices=['text', 'binary'], default='text', help="Output format: one '0'/'1' character per bit, or packed bytes with a header")
+    parser.add_argument('--byteorder', choices=['big', 'little'], default='big', help='Byte order of packed records in binary format')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible output (bulk output is identical for any --workers)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for bulk generation')
+    parser.add_argument('--structure', type=str, default=None, help='Packet structure name (or number) instead of the interactive prompt')
+    parser.add_argument('--structures', action='append', default=[], help='Extra structure definition file or directory (JSON/TOML/YAML), repeatable')
+    parser.add_argument('--set', action='append', default=[], metavar='FIELD=VALUE', help='Value of a manual field, repeatable')
+    parser.add_argument('--log-mode', choices=['summary', 'sampled', 'full'], default='summary', help='Bulk logging: per-run summary with packet CRCs, plus every Nth packet, or every packet')
+    parser.add_argument('--log-sample', type=int, default=1000, help='Log every Nth packet in sampled mode')
+    parser.add_argument('--coverage', action='store_true', help='Constrained-random generation until the coverage goals of the structure are met (--count is then the maximum)')
+    parser.add_argument('--bias', type=float, default=0.5, help='Probability of steering a packet into an unhit coverage bin')
+    parser.add_argument('--golden', type=str, default=None, metavar='MODULE:FUNCTION', help="Golden model writing expected results (default: the structure's 'golden_model')")
+    parser.add_argument('--serve', type=str, default=None, metavar='SOCKET', help='Serve packed packets on demand on this Unix socket instead of writing a file (endless without --count)')
+    parser.add_argument('--prefetch', type=int, default=stimulus_server.DEFAULT_PREFETCH, help='Chunks generated ahead of the readers in --serve mode')
+    instrumentation.add_arguments(parser)
     
     args = parser.parse_args()
 
@@ -128,34 +535,145 @@ def main():
         args.filename = os.path.join(args.filename, 'data_file.txt')
     
     # Logging always enabled by default
-    logging.basicConfig(level=logging.INFO, filename='output.log', filemode='w', format='%(asctime)s - %(levelname)s - %(message)s')
-    if args.p:
-        chosen_structure = choose_packet_structure()
-        if chosen_structure and 'manual_fields' in chosen_structure:
-            generated_packet = generate_packet(chosen_structure)
+    listener = setup_logging('output.log')
+    try:
+        with instrumentation.profiling(args):
+            run(parser, args)
+    finally:
+        listener.stop()
+
+def run(parser, args):
+    if args.workers < 1:
+        parser.error("--workers must be positive")
+    if args.seed is None and args.workers > 1:
+        # Parallel runs always use derived streams; record the seed so they can be reproduced
+        args.seed = random.SystemRandom().getrandbits(64)
+    if args.seed is not None:
+        random.seed(args.seed)
+        log_metadata({"Seed": args.seed})
+    if args.count is not None or args.coverage or args.serve or args.p:
+        try:
+            chosen_structure = choose_packet_structure(packet_registry.load_registry(args.structures), args.structure)
+        except (KeyError, ValueError, OSError) as e:
+            parser.error(str(e).strip('"'))
+    if args.count is not None or args.coverage or args.serve:
+        if (args.count is not None and args.count < 1) or args.chunk_size < 1 or args.prefetch < 1:
+            parser.error("--count, --chunk-size and --prefetch must be positive")
+        if args.coverage and not 0 < args.bias <= 1:
+            parser.error("--bias must be in (0, 1]")
+        # Manual fields are entered once and reused for every packet
+        try:
+            manual_values = manual_field_values(chosen_structure, args.set)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.log_sample < 1:
+            parser.error("--log-sample must be positive")
+        engine = None
+        if args.coverage:
+            try:
+                engine = StimulusEngine(chosen_structure, random, args.bias, manual_values)
+            except ValueError as e:
+                parser.error(f"{chosen_structure['name']}: {e}")
+            if not engine.coverage.hits and args.count is None:
+                parser.error(f"'{chosen_structure['name']}' defines no coverage bins, --count is required")
+        golden_spec = args.golden or chosen_structure.get('golden_model')
+        if golden_spec:
+            try:
+                load_golden_model(golden_spec)
+            except (ImportError, AttributeError, ValueError) as e:
+                parser.error(f"Cannot load golden model '{golden_spec}': {e}")
+        if args.serve:
+            # Offsets in the log count from the start of the served stream
+            args.format = 'binary'
+            packet_filename = args.serve
+            header = packet_file.packet_header(chosen_structure, args.byteorder)
+            first_offset, stride = len(packet_file.encode_header(header)), header['record_bytes']
+        else:
+            packet_filename = packet_filename_for(chosen_structure, args.format)
+            if golden_spec and os.path.exists(packet_filename):
+                # Expected results start a new file, so the stimulus file must too to stay in lockstep
+                os.remove(packet_filename)
+            first_offset, stride = packet_file_layout(chosen_structure, packet_filename, args)
+        log_metadata({"Packet Type": chosen_structure['name'], "Packet Count": args.count, "Workers": args.workers,
+                      "File": packet_filename, "Format": args.format, "First Offset": first_offset, "Packet Stride": stride})
+
+        if engine is not None:
+            chunks = generate_packets_covered(engine, args.count, args.chunk_size)
+        else:
+            chunks = generate_packets_bulk(chosen_structure, args.count, manual_values, args.chunk_size, args.seed, args.workers)
+        chunks = instrumentation.timed(chunks, 'generate')
+        chunks = log_packet_chunks(chunks, args.log_mode, first_offset, stride, args.log_sample)
+        expected_writer = None
+        if golden_spec:
+            expected_writer = ExpectedWriter(expected_filename_for(chosen_structure, args.format), args.format, args.byteorder)
+            chunks = golden_stage(chunks, golden_spec, chosen_structure, expected_writer, args.workers)
+        try:
+            if args.serve:
+                written = stimulus_server.serve(args.serve, chunks, header, args.prefetch)
+            elif args.format == 'binary':
+                written = save_to_file_packets_binary(chunks, chosen_structure, packet_filename, args.byteorder)
+            else:
+                written = save_to_file_packets(chunks, packet_filename)
+        finally:
+            if expected_writer is not None:
+                expected_writer.close()
+        logging.info("%d packets %s %s", written, 'served on' if args.serve else 'saved to', packet_filename)
+        if instrumentation.active:
+            instrumentation.count('packets generated', written)
+            if args.serve:
+                instrumentation.count('bytes written', written * stride)
+            else:
+                instrumentation.count('bytes written', os.path.getsize(packet_filename) - first_offset)
+        if expected_writer is not None:
+            logging.info("%d expected results of %s saved to %s", expected_writer.count, golden_spec, expected_writer.filename)
+        if engine is not None:
+            if not engine.coverage.done() and engine.stalled >= MAX_STALLED_PACKETS:
+                logging.warning("Coverage stalled: no new bin in the last %d packets", engine.stalled)
+            logging.info("Coverage: %.1f%% (goal %s%%)", engine.coverage.percent(), engine.coverage.goal)
+            for line in engine.coverage.report():
+                logging.info("%s", line)
+            print(f"{written} packets, coverage {engine.coverage.percent():.1f}%")
+    elif args.p:
+        if chosen_structure and chosen_structure.get('manual_fields'):
+            try:
+                manual_values = manual_field_values(chosen_structure, args.set)
+            except ValueError as e:
+                parser.error(str(e))
+            with instrumentation.phase('generate'):
+                generated_packet = generate_packet(chosen_structure, 0, manual_values)
             log_metadata({"Packet Type": chosen_structure['name']})
             log_generated_data_packet(generated_packet,chosen_structure['name'])
 
-            packet_filename = f"{chosen_structure['name']}_packet.txt"
-            save_to_file_packet(generated_packet, packet_filename)
-            logging.info(f"Packet data saved to {packet_filename}")
+            packet_filename = packet_filename_for(chosen_structure, args.format)
+            with instrumentation.phase('write'):
+                save_packet(generated_packet, chosen_structure, packet_filename, args)
+            instrumentation.count('packets generated')
+            logging.info("Packet data saved to %s", packet_filename)
         elif chosen_structure:
-            logging.warning(f"Chosen structure '{chosen_structure['name']}' does not have manual fields.")
-            generated_packet = generate_packet(chosen_structure)
+            logging.warning("Chosen structure '%s' does not have manual fields.", chosen_structure['name'])
+            with instrumentation.phase('generate'):
+                generated_packet = generate_packet(chosen_structure)
             log_metadata({"Packet Type": chosen_structure['name']})
             log_generated_data_packet(generated_packet,chosen_structure['name'])
 
-            packet_filename = f"{chosen_structure['name']}_packet.txt"
-            save_to_file_packet(generated_packet, packet_filename)
-            logging.info(f"Packet data saved to {packet_filename}")
+            packet_filename = packet_filename_for(chosen_structure, args.format)
+            with instrumentation.phase('write'):
+                save_packet(generated_packet, chosen_structure, packet_filename, args)
+            instrumentation.count('packets generated')
+            logging.info("Packet data saved to %s", packet_filename)
         else: 
             logging.error("Cannot generate packet for the chosen structure. Missing manual fields")
     else:
-        generated_data = generate_data(args.manual, args.sizes)
+        with instrumentation.phase('generate'):
+            generated_data = generate_data(args.manual, args.sizes)
         log_metadata({"Data Type": "Generated Data"})
         log_generated_data(generated_data, "Data")
-        save_to_file_data(generated_data, args.filename)  # Use the provided filename
-        logging.info(f"Data saved to {args.filename}")
+        with instrumentation.phase('write'):
+            if args.format == 'binary':
+                save_to_file_data_binary(generated_data, args.filename, args.byteorder)
+            else:
+                save_to_file_data(generated_data, args.filename)  # Use the provided filename
+        logging.info("Data saved to %s", args.filename)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
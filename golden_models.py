@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""Golden models for the expected-result stage of generate_data_for_testbench.py.
+
+A golden model is any importable callable taking the input Packet and
+returning the expected output, either as a Packet (of the same or another
+layout) or as a '0'/'1' wire line. Select one with
+--golden golden_models:loopback or with "golden_model" in the structure
+definition.
+"""
+
+def loopback(packet):
+    """Pass-through design: the output equals the input."""
+    return packet
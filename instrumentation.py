@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Optional phase timing and counters shared by the generator scripts.
+
+Scripts mark their phases with `with instrumentation.phase('parse'):` and
+count work with instrumentation.count('ports parsed', n). Until --profile
+enables a Profile, phase() returns one shared no-op context manager and
+count() returns at once, so disabled instrumentation costs a global lookup.
+Callers only do extra work to measure something (e.g. stat a file) under
+`if instrumentation.active:`.
+
+The report goes to stderr: wall and CPU time per phase, then the counters.
+--profile-dump also writes cProfile statistics (read them with pstats) and
+--profile-memory traces allocations with tracemalloc.
+
+Work done in pool worker processes is timed as the wait of the parent
+process and is not counted; use --jobs 1 / --workers 1 for exact counters.
+"""
+
+import sys
+import time
+import cProfile
+import tracemalloc
+import contextlib
+
+TOP_ALLOCATIONS = 10
+
+# The Profile of this run, or None when instrumentation is disabled
+active = None
+_null_phase = contextlib.nullcontext()
+
+class Phase:
+    __slots__ = ('totals', 'wall', 'cpu')
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def __exit__(self, *exc):
+        totals = self.totals
+        totals[0] += 1
+        totals[1] += time.perf_counter() - self.wall
+        totals[2] += time.process_time() - self.cpu
+
+class Profile:
+    def __init__(self, dump_file=None, trace_memory=False):
+        # name -> [calls, wall seconds, cpu seconds], in order of first use
+        self.phases = {}
+        self.counters = {}
+        self.dump_file = dump_file
+        self.trace_memory = trace_memory
+        self.profiler = cProfile.Profile() if dump_file else None
+
+    def phase(self, name):
+        totals = self.phases.get(name)
+        if totals is None:
+            totals = self.phases[name] = [0, 0.0, 0.0]
+        return Phase(totals)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def start(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profiler:
+            self.profiler.enable()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def stop(self):
+        self.phases['total'] = [1, time.perf_counter() - self.wall, time.process_time() - self.cpu]
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.dump_file)
+        if self.trace_memory:
+            self.memory = tracemalloc.get_traced_memory()
+            self.allocations = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+            tracemalloc.stop()
+
+    def report(self, stream=None):
+        stream = stream or sys.stderr
+        stream.write(f"{'phase':<24}{'calls':>8}{'wall s':>12}{'cpu s':>12}\n")
+        for name, (calls, wall, cpu) in self.phases.items():
+            stream.write(f"{name:<24}{calls:>8}{wall:>12.4f}{cpu:>12.4f}\n")
+        for name, value in self.counters.items():
+            stream.write(f"{name}: {value}\n")
+        if self.trace_memory:
+            current, peak = self.memory
+            stream.write(f"memory: {current / 1e6:.1f} MB at exit, {peak / 1e6:.1f} MB peak\n")
+            for statistic in self.allocations:
+                stream.write(f"  {statistic}\n")
+        if self.dump_file:
+            stream.write(f"cProfile statistics written to {self.dump_file}\n")
+
+def phase(name):
+    if active is None:
+        return _null_phase
+    return active.phase(name)
+
+def count(name, amount=1):
+    if active is not None:
+        active.count(name, amount)
+
+def timed(iterable, name):
+    """Pass items through, timing the production of each item as phase `name`."""
+    if active is None:
+        return iterable
+    return _timed(iterable, name)
+
+def _timed(iterable, name):
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def add_arguments(parser):
+    parser.add_argument("--profile", action="store_true", help="Report wall/CPU time per phase and work counters on stderr.")
+    parser.add_argument("--profile-dump", metavar="FILE", default=None, help="With --profile, also write cProfile statistics to FILE.")
+    parser.add_argument("--profile-memory", action="store_true", help="With --profile, also trace memory allocations.")
+
+@contextlib.contextmanager
+def profiling(args):
+    """Enable instrumentation for the body when args.profile is set, then report."""
+    global active
+    if not getattr(args, 'profile', False):
+        yield
+        return
+    active = Profile(args.profile_dump, args.profile_memory)
+    active.start()
+    try:
+        yield
+    finally:
+        profile, active = active, None
+        profile.stop()
+        profile.report()
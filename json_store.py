@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""JSON state files shared by the generator scripts (caches, indexes, batch state).
+
+Files are written to a temporary file and moved over the old one, so an
+interrupted run never leaves a corrupt file. A missing or unreadable file
+reads as None: the caller rebuilds its state with a full run.
+"""
+
+import os
+import json
+
+TMP_SUFFIX = '.tmp'
+
+def load_json(path):
+    """Content of the JSON file path, or None when it is missing or unreadable."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_json(path, data, **dump_options):
+    tmp_file = path + TMP_SUFFIX
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, **dump_options)
+    os.replace(tmp_file, path)
+
+def load_versioned(path, version):
+    """The 'files' of a file saved by save_versioned with the same version, otherwise {}."""
+    data = load_json(path)
+    if not isinstance(data, dict) or data.get('version') != version or not isinstance(data.get('files'), dict):
+        return {}
+    return data['files']
+
+def save_versioned(path, version, files):
+    save_json(path, {'version': version, 'files': files})
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Field-level packet encoder/decoder.
+
+A Packet stores its bits in one integer in logical order: the first field of
+the structure holds the most significant bits, exactly like the '0'/'1'
+strings of generate_packet joined together. The wire order written by
+save_to_file_packet is that string reversed (last field first, each field
+LSB first); to_wire()/from_wire() convert between the two.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import packet_file
+import packet_registry
+
+class PacketLayout:
+    """Precomputed field offsets of a packet structure."""
+    __slots__ = ('name', 'fields', 'offsets', 'total_bits')
+
+    def __init__(self, structure):
+        self.name = structure['name']
+        self.fields = list(structure['fields'].items())
+        self.total_bits = sum(width for _, width in self.fields)
+        # name -> (shift of the field LSB in the logical integer, width, mask)
+        self.offsets = {}
+        offset = 0
+        for field, width in self.fields:
+            self.offsets[field] = (self.total_bits - offset - width, width, (1 << width) - 1)
+            offset += width
+
+    @classmethod
+    def from_header(cls, header):
+        """Layout of a binary packet file header (fields stored in wire order)."""
+        return cls({'name': header['structure'], 'fields': dict(reversed(header['fields']))})
+
+class Packet:
+    __slots__ = ('layout', 'value')
+
+    def __init__(self, layout, value=0):
+        self.layout = layout
+        self.value = value
+
+    def get(self, field):
+        shift, _, mask = self.layout.offsets[field]
+        return (self.value >> shift) & mask
+
+    def set(self, field, value):
+        shift, width, mask = self.layout.offsets[field]
+        if not 0 <= value <= mask:
+            raise ValueError(f"{value} does not fit in the {width} bits of '{field}'")
+        self.value = (self.value & ~(mask << shift)) | (value << shift)
+
+    __getitem__ = get
+    __setitem__ = set
+
+    def as_dict(self):
+        """Field values as integers, in structure order."""
+        return {field: self.get(field) for field, _ in self.layout.fields}
+
+    def field_bits(self):
+        """Field values as binary strings, the format returned by generate_packet."""
+        bits = self.to_bits()
+        result = {}
+        offset = 0
+        for field, width in self.layout.fields:
+            result[field] = bits[offset:offset + width]
+            offset += width
+        return result
+
+    def to_bits(self):
+        """Logical bit order: fields in structure order, each MSB first."""
+        return format(self.value, f'0{self.layout.total_bits}b')
+
+    def to_wire(self):
+        """Wire bit order: the line written by save_to_file_packet."""
+        return self.to_bits()[::-1]
+
+    def to_record(self, header):
+        """Packed record bytes for a binary packet file."""
+        return packet_file.pack_record(self.to_wire(), header)
+
+    @classmethod
+    def from_bits(cls, layout, bits):
+        if len(bits) != layout.total_bits:
+            raise ValueError(f"Expected {layout.total_bits} bits for '{layout.name}', got {len(bits)}")
+        return cls(layout, int(bits, 2))
+
+    @classmethod
+    def from_wire(cls, layout, line):
+        return cls.from_bits(layout, line[::-1])
+
+    @classmethod
+    def from_fields(cls, layout, packet_data):
+        """Build a packet from the {field: binary string} dict of generate_packet."""
+        return cls.from_bits(layout, ''.join(packet_data[field] for field, _ in layout.fields))
+
+    def __eq__(self, other):
+        return isinstance(other, Packet) and self.layout.fields == other.layout.fields and self.value == other.value
+
+    def __repr__(self):
+        return f"Packet({self.layout.name!r}, {self.as_dict()!r})"
+
+def decode_file(filename, structure=None):
+    """Yield every packet of a text or binary packet file as a Packet.
+
+    Binary files carry their own layout; text files need the structure.
+    """
+    with open(filename, 'rb') as f:
+        is_binary = f.read(len(packet_file.MAGIC)) == packet_file.MAGIC
+    if is_binary:
+        with packet_file.PacketReader(filename) as reader:
+            layout = PacketLayout.from_header(reader.header)
+            for index in range(len(reader)):
+                yield Packet.from_wire(layout, reader.line(index))
+        return
+    if structure is None:
+        raise ValueError(f"{filename}: decoding a text packet file needs its structure")
+    layout = PacketLayout(structure)
+    with open(filename, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield Packet.from_wire(layout, line)
+
+def decode_records(filename, structure=None):
+    """Decode a packet file into a list of {field: int} records."""
+    return [packet.as_dict() for packet in decode_file(filename, structure)]
+
+def packet_filename_structure(filename, registry):
+    """Guess the structure of '<name>_packet.txt' from the registry, or None."""
+    name = os.path.basename(filename).rsplit('_packet.', 1)[0]
+    return registry.get(name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a generated packet file into one JSON record per packet.")
+    parser.add_argument("filename", help="Text or binary packet file.")
+    parser.add_argument("--structure", help="Structure name for text files (default: taken from the file name).")
+    parser.add_argument("--structures", action="append", default=[], help="Extra structure definition file or directory, repeatable.")
+    args = parser.parse_args()
+
+    registry = packet_registry.load_registry(args.structures)
+    if args.structure:
+        structure = packet_registry.find_structure(registry, args.structure)
+    else:
+        structure = packet_filename_structure(args.filename, registry)
+    for packet in decode_file(args.filename, structure):
+        sys.stdout.write(json.dumps(packet.as_dict()) + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Compact binary container for generated testbench stimulus.
+
+Layout: b'PKTB', a little-endian uint32 header length, a JSON header padded
+to 8 bytes, then fixed-size records. Each record holds one text line of the
+'0'/'1' format (wire bit order) packed into bytes: the first wire bit is the
+MSB of the record integer, which is stored in the header's byte order.
+The header lists fields in wire order; within a field the first wire bit
+is the field's LSB ('lsb_first'), matching the reversed text output.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b'PKTB'
+VERSION = 1
+HEADER_ALIGN = 8
+
+def make_header(name, fields, byteorder='big'):
+    """Build a header for records made of (field name, width) pairs in wire order."""
+    if byteorder not in ('big', 'little'):
+        raise ValueError(f"Invalid byte order: {byteorder}")
+    total_bits = sum(width for _, width in fields)
+    return {
+        'version': VERSION,
+        'structure': name,
+        'fields': [[field, width] for field, width in fields],
+        'total_bits': total_bits,
+        'record_bytes': (total_bits + 7) // 8,
+        'byteorder': byteorder,
+        'bit_order': 'lsb_first',
+    }
+
+def packet_header(structure, byteorder='big'):
+    """Header for packets written like save_to_file_packet (fields reversed)."""
+    fields = list(structure['fields'].items())[::-1]
+    return make_header(structure['name'], fields, byteorder)
+
+def encode_header(header):
+    payload = json.dumps(header, sort_keys=True).encode('ascii')
+    size = len(MAGIC) + 4 + len(payload)
+    padding = -size % HEADER_ALIGN
+    payload += b' ' * padding
+    return MAGIC + struct.pack('<I', len(payload)) + payload
+
+def read_header(f):
+    """Read the header from an open binary file. Returns (header, data offset)."""
+    prefix = f.read(len(MAGIC) + 4)
+    if len(prefix) != len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary packet file")
+    (length,) = struct.unpack('<I', prefix[len(MAGIC):])
+    header = json.loads(f.read(length).decode('ascii'))
+    if header.get('version') != VERSION:
+        raise ValueError(f"Unsupported packet file version: {header.get('version')}")
+    return header, len(prefix) + length
+
+def pack_record(line, header):
+    """Pack a '0'/'1' line in wire order into record bytes."""
+    total_bits = header['total_bits']
+    if len(line) != total_bits:
+        raise ValueError(f"Expected {total_bits} bits, got {len(line)}")
+    record_bytes = header['record_bytes']
+    value = int(line, 2) << (record_bytes * 8 - total_bits) if line else 0
+    return value.to_bytes(record_bytes, header['byteorder'])
+
+def unpack_record(buf, header):
+    """Unpack record bytes back into a '0'/'1' line in wire order."""
+    total_bits = header['total_bits']
+    value = int.from_bytes(buf, header['byteorder']) >> (header['record_bytes'] * 8 - total_bits)
+    return format(value, f'0{total_bits}b')
+
+class PacketWriter:
+    """Append packed records to a binary packet file.
+
+    An existing file is appended to when its header matches, otherwise
+    a ValueError is raised so records of different layouts never mix.
+    """
+
+    def __init__(self, filename, header):
+        self.header = header
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            with open(filename, 'rb') as f:
+                existing, _ = read_header(f)
+            if existing != header:
+                raise ValueError(f"{filename} holds '{existing['structure']}' records with a different layout")
+            self._file = open(filename, 'ab')
+        else:
+            self._file = open(filename, 'wb')
+            self._file.write(encode_header(header))
+        self.count = 0
+
+    def write(self, line):
+        self._file.write(pack_record(line, self.header))
+        self.count += 1
+
+    def write_lines(self, lines):
+        header = self.header
+        self._file.write(b''.join(pack_record(line, header) for line in lines))
+        self.count += len(lines)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PacketReader:
+    """Memory-mapped random access to the records of a binary packet file.
+
+    Records are returned as memoryview slices of the mapping, so reading a
+    packet does not copy the file. Field values are decoded on request.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'rb')
+        self.header, self._offset = read_header(self._file)
+        self._record_bytes = self.header['record_bytes']
+        size = os.fstat(self._file.fileno()).st_size
+        if size > self._offset:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        else:
+            self._mmap = None
+            self._view = memoryview(b'')
+        self._count = (size - self._offset) // self._record_bytes if self._record_bytes else 0
+
+        # Field name -> (wire offset, width)
+        self.fields = {}
+        offset = 0
+        for field, width in self.header['fields']:
+            self.fields[field] = (offset, width)
+            offset += width
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """Raw record bytes of one packet as a zero-copy memoryview."""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("packet index out of range")
+        start = self._offset + index * self._record_bytes
+        return self._view[start:start + self._record_bytes]
+
+    def records(self, start=0, stop=None):
+        """Zero-copy view over a contiguous run of records."""
+        stop = self._count if stop is None else stop
+        if not 0 <= start <= stop <= self._count:
+            raise IndexError(f"invalid record range [{start}, {stop}) for {self._count} records")
+        begin = self._offset + start * self._record_bytes
+        return self._view[begin:self._offset + stop * self._record_bytes]
+
+    def line(self, index):
+        """Packet as a '0'/'1' line, identical to the text format."""
+        return unpack_record(self[index], self.header)
+
+    def field(self, index, name):
+        """Integer value of a field of one packet."""
+        offset, width = self.fields[name]
+        header = self.header
+        value = int.from_bytes(self[index], header['byteorder'])
+        shift = header['record_bytes'] * 8 - offset - width
+        wire_bits = format((value >> shift) & ((1 << width) - 1), f'0{width}b')
+        # Fields are stored LSB first on the wire
+        return int(wire_bits[::-1], 2)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass # Records handed out are still alive; the mapping is unmapped once they are collected
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Registry of packet structures loaded from JSON, TOML or YAML files.
+
+A definition file holds a list of structures under the key 'structures':
+
+    {"structures": [
+        {"name": "Mission Frame G2G RCC",
+         "fields": [
+            {"name": "Version No", "width": 2, "policy": "manual"},
+            {"name": "VC Frame Count", "width": 24, "policy": "counter", "start": 0, "step": 1},
+            {"name": "Spare", "width": 2, "policy": "fixed", "value": 0},
+            {"name": "VCA SDU", "width": 3616}
+        ]}
+    ]}
+
+The policy of a field is random (default), manual, fixed or counter.
+Fields and structures may also carry the constraints and coverage goals
+described in stimulus_engine.py.
+A structure may name a golden model as "golden_model": "module:function"
+(see generate_data_for_testbench.load_golden_model).
+Each structure is compiled once into the dict used by
+generate_data_for_testbench.py: 'fields' maps names to widths as before and
+'offsets' is the precomputed field-offset table.
+"""
+
+import os
+import json
+
+DEFAULT_STRUCTURES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packet_structures.json')
+POLICIES = ('random', 'manual', 'fixed', 'counter')
+STRUCTURE_EXTENSIONS = ('.json', '.toml', '.yaml', '.yml')
+
+def load_definitions(filename, key='structures'):
+    """Read the raw definitions listed under key in one file, chosen by extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.json':
+        with open(filename, 'r') as f:
+            data = json.load(f)
+    elif extension == '.toml':
+        import tomllib
+        with open(filename, 'rb') as f:
+            data = tomllib.load(f)
+    elif extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"{filename}: reading YAML files requires PyYAML")
+        with open(filename, 'r') as f:
+            data = yaml.safe_load(f)
+    else:
+        raise ValueError(f"{filename}: unsupported definition file type")
+    if not isinstance(data, dict) or not isinstance(data.get(key), list):
+        raise ValueError(f"{filename}: expected a list of {key} under '{key}'")
+    return data[key]
+
+def compile_structure(definition, source='<definition>'):
+    """Validate a structure definition and precompute its field-offset table.
+
+    offsets holds one (field, offset, width, wire_start) entry per field, where
+    offset counts from the first field and wire_start is the position of the
+    field in the reversed line written by save_to_file_packet.
+    """
+    name = definition.get('name')
+    if not name:
+        raise ValueError(f"{source}: structure without a name")
+    fields = {}
+    policies = {}
+    for field in definition.get('fields', []):
+        field_name = field.get('name')
+        width = field.get('width')
+        if not field_name or not isinstance(width, int) or width <= 0:
+            raise ValueError(f"{source}: '{name}' has a field without a name or a positive width")
+        if field_name in fields:
+            raise ValueError(f"{source}: '{name}' defines field '{field_name}' twice")
+        policy = field.get('policy', 'random')
+        if policy not in POLICIES:
+            raise ValueError(f"{source}: '{name}'.'{field_name}' has unknown policy '{policy}'")
+        spec = {'policy': policy}
+        if policy == 'fixed':
+            if 'value' not in field:
+                raise ValueError(f"{source}: fixed field '{name}'.'{field_name}' needs a value")
+            spec['value'] = parse_value(field['value'])
+            if not 0 <= spec['value'] < 1 << width:
+                raise ValueError(f"{source}: fixed value {field['value']} of '{name}'.'{field_name}' does not fit in {width} bits")
+        elif policy == 'counter':
+            spec['start'] = parse_value(field.get('start', 0))
+            spec['step'] = parse_value(field.get('step', 1))
+        # Constraints used by the coverage-driven engine (stimulus_engine.py)
+        try:
+            if 'range' in field:
+                spec['range'] = parse_bounds(field['range'])
+            if 'weights' in field:
+                spec['weights'] = [parse_weight(entry) for entry in field['weights']]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{source}: '{name}'.'{field_name}' has an invalid range or weights entry") from None
+        fields[field_name] = width
+        policies[field_name] = spec
+    if not fields:
+        raise ValueError(f"{source}: '{name}' has no fields")
+
+    coverage = dict(definition.get('coverage', {}))
+    if 'fields' in coverage:
+        coverage['fields'] = {field: compile_bins(bins, f"{source}: '{name}' coverage of '{field}'")
+                              for field, bins in coverage['fields'].items()}
+
+    total_bits = sum(fields.values())
+    offsets = []
+    offset = 0
+    for field_name, width in fields.items():
+        offsets.append((field_name, offset, width, total_bits - offset - width))
+        offset += width
+
+    return {
+        'name': name,
+        'fields': fields,
+        'manual_fields': [field for field, spec in policies.items() if spec['policy'] == 'manual'],
+        'policies': policies,
+        'offsets': offsets,
+        'total_bits': total_bits,
+        'rules': definition.get('rules', []),
+        'coverage': coverage,
+        'golden_model': definition.get('golden_model'),
+        'source': source,
+    }
+
+def parse_bounds(bounds):
+    """[lo, hi] of a range given as a pair of parse_value values."""
+    lo, hi = bounds
+    return [parse_value(lo), parse_value(hi)]
+
+def parse_weight(entry):
+    """Copy of a weights entry with its value or range parsed."""
+    weight = dict(entry)
+    if 'range' in weight:
+        weight['range'] = parse_bounds(weight['range'])
+    else:
+        weight['value'] = parse_value(weight['value'])
+    if isinstance(weight.get('weight', 1), bool) or not isinstance(weight.get('weight', 1), (int, float)):
+        raise ValueError("weight must be a number")
+    return weight
+
+def compile_bins(bins, context):
+    """Coverage bins with their [lo, hi] ranges parsed; named bins are kept as they are."""
+    compiled = []
+    for entry in bins or []:
+        if isinstance(entry, str):
+            compiled.append(entry)
+            continue
+        try:
+            compiled.append(parse_bounds(entry))
+        except (TypeError, ValueError):
+            raise ValueError(f"{context} has an invalid bin {entry!r}") from None
+    return compiled
+
+def parse_value(value):
+    """Accept integers or decimal/hex/binary/octal strings (e.g. '0x1A', '0b101', '01')."""
+    if isinstance(value, int):
+        return value
+    text = str(value).strip()
+    # Only prefixed strings go through base 0, which rejects decimals with leading zeros
+    if text.lstrip('+-')[:2].lower() in ('0x', '0b', '0o'):
+        return int(text, 0)
+    return int(text, 10)
+
+def structure_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, file) for file in os.listdir(path)
+                                if file.lower().endswith(STRUCTURE_EXTENSIONS)))
+        else:
+            files.append(path)
+    return files
+
+def load_registry(paths=None, include_default=True):
+    """Load and compile structures from the default file and the given files or directories.
+
+    Returns an ordered dict of name -> compiled structure. A later file may
+    redefine a structure of an earlier one.
+    """
+    files = ([DEFAULT_STRUCTURES_FILE] if include_default else []) + structure_files(paths or [])
+    registry = {}
+    for filename in files:
+        for definition in load_definitions(filename):
+            structure = compile_structure(definition, filename)
+            registry.pop(structure['name'], None)
+            registry[structure['name']] = structure
+    return registry
+
+def find_structure(registry, name):
+    """Look a structure up by name (case-insensitive) or by its 1-based number."""
+    if name in registry:
+        return registry[name]
+    for structure_name, structure in registry.items():
+        if structure_name.lower() == name.lower():
+            return structure
+    if name.isdigit() and 1 <= int(name) <= len(registry):
+        return list(registry.values())[int(name) - 1]
+    raise KeyError(f"Unknown packet structure '{name}'. Available: {', '.join(registry)}")
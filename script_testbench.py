@@ -3,11 +3,32 @@
 import re
 import sys
 import os
+import string
 import argparse
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from vhdl_parser import parse_vhdl, generic_declaration
+from vhdl_index import TypeIndex, collect_sources
+import json_store
+import vhdl_types
+from file_watcher import PollingWatcher
+import instrumentation
+
+SIMULATION_DIR = "simulation"
+STATE_FILENAME = ".tb_state.json"
+INDEX_FILENAME = ".vhdl_type_index.json"
+
+# The extract_* helpers take either VHDL source text or an already parsed EntityModel
+def entity_model(vhdl_content):
+    if isinstance(vhdl_content, str):
+        return parse_vhdl(vhdl_content)
+    return vhdl_content
 
 def extract_ports(vhdl_content):
-    port_pattern = re.compile(r'(\w+)\s*:\s*(in|out)\s+([\w_]+\([\w\s\d]+\)|[\w_]+)\s*;?', re.IGNORECASE)
-    return port_pattern.findall(vhdl_content)
+    """Entity ports as (name, mode, type) tuples."""
+    return entity_model(vhdl_content).ports
 
 def extract_record_type_contents(vhdl_content, record_type_name):
     record_type_pattern = re.compile(fr'type\s+{record_type_name}\s+is\s+record(.*?)end\s+record;', re.IGNORECASE | re.DOTALL)
@@ -16,25 +37,17 @@ def extract_record_type_contents(vhdl_content, record_type_name):
         return match.group(1).strip()
     return None
 
-def convert_to_signal(port_tuple, vhdl_content, processed_record_types, package_filename = None):
+def convert_to_signal(port_tuple, vhdl_content, processed_record_types, package_filename = None, type_index = None):
     name, _, data_type = port_tuple
-    
-    default_values = {
-        r'std_logic_vector': "(others => '0')",
-        r'std_logic': "'0'",
-        r'unsigned' : "(others => '0')",
-        r'signed' : "(others => '0')",
-        r'integer': 0, 
-        # Add more patterns and default values as required
-    }
-
-    default_value = "UNKNOWN_TYPE"
 
-    # Loop through the patterns to find a match and get the default value
-    for pattern, value in default_values.items():
-        if re.search(pattern, data_type, re.IGNORECASE):
-            default_value = value
-            break
+    if type_index is not None:
+        # Project types (records, subtypes, arrays, enums) resolve through the package index
+        default_value = type_index.default_value(data_type, processed_record_types)
+    else:
+        # Standard types, range constraints and registered rules (vhdl_types.py)
+        default_value = vhdl_types.default_value(data_type)
+    if default_value is None:
+        default_value = "UNKNOWN_TYPE"
 
     return f'signal {name} : {data_type} := {default_value};'
 
@@ -43,69 +56,44 @@ def create_port_map(port_tuple):
     return f'{name} => {name}'
 
 def extract_entity_name(vhdl_content):
-    entity_pattern = re.compile(r'entity\s+(\w+)\s+is', re.IGNORECASE)
-    match = entity_pattern.search(vhdl_content)
-    if match:
-        return match.group(1)
-    return None
+    return entity_model(vhdl_content).name
 
 def create_component_declaration(generics,ports,entity_name):
-    component_name = entity_name  # Use the provided entity_name
-    
+    """Yield the component declaration piece by piece, without joining the port list."""
     generic_declarations = ['   {}'.format(generic.strip()) for generic in generics if generic.strip()]
-    port_declarations = ['    {name} : {direction} {data_type}'.format(name=name, direction=direction, data_type=data_type) for name, direction, data_type in ports]
-    
-    component_decl = """component {component_name} is"""
+
+    yield f"component {entity_name} is"
     if generic_declarations:
-        component_decl += """
+        yield """
         generic(
-            {generic_declarations}
+            """
+        yield ';\n'.join(generic_declarations)
+        yield """
         );"""
-        component_decl+= """
-        port (
-            {port_declarations}
-        );
-        end component;"""
-    else:
-        component_decl+= """
+    yield """
         port (
-            {port_declarations}
+            """
+    for index, (name, direction, data_type) in enumerate(ports):
+        if index:
+            yield ';\n'
+        yield f'    {name} : {direction} {data_type}'
+    yield """
         );
         end component;"""
-    return component_decl.format(component_name=component_name, generic_declarations=';\n'.join(generic_declarations), port_declarations=';\n'.join(port_declarations))
 
 def extract_libraries(vhdl_content):
-    library_pattern = re.compile(r'library\s+(\w+);', re.IGNORECASE)
-    libraries = library_pattern.findall(vhdl_content)
-
-    use_pattern = re.compile(r'use\s+(.*?);',re.IGNORECASE)
-    uses = use_pattern.findall(vhdl_content)
-
-    return libraries, uses
+    model = entity_model(vhdl_content)
+    return model.libraries, model.uses
 
 def extract_generics(vhdl_content):
-    generic_pattern = re.compile(r'generic\s*\(\s*(.*?)\s*\)', re.IGNORECASE | re.DOTALL)
-    match = generic_pattern.search(vhdl_content)
-    if match:
-        return match.group(1).strip().split(';')
-    return[]
+    """Generic declarations such as 'WIDTH : integer := 8', one per generic name."""
+    return [generic_declaration(generic) for generic in entity_model(vhdl_content).generics]
 
 def create_generic_map(generic):
     return f'{generic.split(":")[0].strip()} => {generic.split(":")[0].strip()}'
 
-def update_testbench_content(existing_content, ports, generics, libraries_declaration, uses_declaration, vhdl_base_filename, signals, component_declaration, generic_maps, entity_name, port_maps):
-    # Extract the part between markers
-    start_marker = "-- testbench logic starts here."
-    end_marker = "-- testbench logic ends here."
-    start_index = existing_content.find(start_marker)
-    end_index = existing_content.find(end_marker)
-
-    if start_index != -1 and end_index != -1:
-        logic_to_preserve = existing_content[start_index + len(start_marker):end_index].strip()
-    else:
-        logic_to_preserve = ""
-    # Construct the updated content
-    updated_content = """
+# Testbench layout; list and generator fields are streamed item by item (see testbench_sections)
+TESTBENCH_TEMPLATE = """
 {libraries_declaration}
 {uses_declaration}
 
@@ -172,38 +160,132 @@ UUT: entity work.{entity_name}
 <= SYSCLK
 <= reset 
 end sim;
-""".format(libraries_declaration=libraries_declaration,
-           uses_declaration=uses_declaration,
-           tb_name=f"tb_{vhdl_base_filename}",
-           converted_signals="\n".join(signals), 
-           component_declaration=component_declaration,
-           entity_name=entity_name,
-           generic_map_line = 'generic map ('+','.join(generic_maps) + ')' if generic_maps else '',
-           port_maps=",\n    ".join(port_maps),
-           preserved_logic = logic_to_preserve)
-    
-    return updated_content
-
-def main():
-    parser = argparse.ArgumentParser(description="Generate VHDL testbench.")
-    parser.add_argument("vhdl_filename", help="Path to the VHDL file.")
-    parser.add_argument("--package", help = "Path to the VHDL package file.")
-    
-    args = parser.parse_args()
-
-    vhdl_filename = args.vhdl_filename
-    package_filename = args.package
+"""
+TESTBENCH_START_MARKER = "-- testbench logic starts here."
+TESTBENCH_END_MARKER = "-- testbench logic ends here."
+TESTBENCH_SEPARATOR = "--============================================================"
+WRITE_BUFFER_SIZE = 1 << 20
+
+# The template split once into (literal text, field name) pieces
+TESTBENCH_PIECES = [(literal, field) for literal, field, _, _ in string.Formatter().parse(TESTBENCH_TEMPLATE)]
+# Batch runs regenerate every testbench when the template changes
+TEMPLATE_HASH = hashlib.sha256((TESTBENCH_TEMPLATE + TESTBENCH_SEPARATOR).encode()).hexdigest()
+
+def preserved_testbench_logic(existing_content):
+    # Extract the part between markers
+    start_index = existing_content.find(TESTBENCH_START_MARKER)
+    end_index = existing_content.find(TESTBENCH_END_MARKER)
+
+    if start_index == -1 or end_index == -1:
+        return ""
+    logic = existing_content[start_index + len(TESTBENCH_START_MARKER):end_index].strip()
+    # Drop the separators the template puts around the logic, or every update would nest another pair
+    if logic.startswith(TESTBENCH_SEPARATOR):
+        logic = logic[len(TESTBENCH_SEPARATOR):]
+    if logic.endswith(TESTBENCH_SEPARATOR):
+        logic = logic[:-len(TESTBENCH_SEPARATOR)]
+    return logic.strip()
+
+def testbench_sections(existing_content, ports, generics, libraries_declaration, uses_declaration, vhdl_base_filename, signals, component_declaration, generic_maps, entity_name, port_maps):
+    """Yield the testbench text piece by piece, without joining the signal and port map lists."""
+    fields = {
+        'libraries_declaration': libraries_declaration,
+        'uses_declaration': uses_declaration,
+        'tb_name': f"tb_{vhdl_base_filename}",
+        'converted_signals': (signals, "\n"),
+        'component_declaration': component_declaration,
+        'entity_name': entity_name,
+        'generic_map_line': 'generic map ('+','.join(generic_maps) + ')' if generic_maps else '',
+        'port_maps': (port_maps, ",\n    "),
+        'preserved_logic': preserved_testbench_logic(existing_content),
+    }
+    for literal, field in TESTBENCH_PIECES:
+        yield literal
+        if field is None:
+            continue
+        value = fields[field]
+        if isinstance(value, tuple):
+            items, separator = value
+            for index, item in enumerate(items):
+                if index:
+                    yield separator
+                yield item
+        elif isinstance(value, str):
+            yield value
+        else:
+            yield from value
 
-    if not vhdl_filename:
-        print("usage: script_testbench.py <your_vhdl_file> --package <your_package_file> ")
-        return
-    
-    # Read the VHDL file
-    with open(vhdl_filename, 'r') as file:
-        vhdl_content = file.read()
+def update_testbench_content(existing_content, ports, generics, libraries_declaration, uses_declaration, vhdl_base_filename, signals, component_declaration, generic_maps, entity_name, port_maps):
+    return ''.join(testbench_sections(existing_content, ports, generics, libraries_declaration, uses_declaration, vhdl_base_filename, signals, component_declaration, generic_maps, entity_name, port_maps))
+
+def write_testbench(testbench_filepath, sections, existing_content=None):
+    """Stream sections to a temporary file and move it over testbench_filepath.
+
+    The file is left untouched (no new mtime, no simulator recompile) when the
+    content hash equals the one of existing_content. Returns (bytes, replaced).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_file = testbench_filepath + '.tmp'
+    try:
+        with open(tmp_file, 'w', buffering=WRITE_BUFFER_SIZE) as file:
+            for section in sections:
+                file.write(section)
+                digest.update(section.encode())
+                size += len(section)
+        if existing_content is not None and hashlib.sha256(existing_content.encode()).digest() == digest.digest():
+            os.remove(tmp_file)
+            return size, False
+        os.replace(tmp_file, testbench_filepath)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    return size, True
+
+def testbench_path(vhdl_filename, output_dir=SIMULATION_DIR):
+    # Extract filename without the extension
+    vhdl_base_filename = os.path.splitext(os.path.basename(vhdl_filename))[0]
+    # Construct testbench with tb_prefix and combine with the desired relative path
+    return os.path.join(output_dir, f"tb_{vhdl_base_filename}.vhd")
+
+def load_type_index(paths, output_dir=SIMULATION_DIR):
+    """Load the persistent type index of output_dir and bring it up to date with paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    type_index = TypeIndex(os.path.join(output_dir, INDEX_FILENAME))
+    if type_index.update(paths):
+        type_index.save()
+    return type_index
+
+def read_model(vhdl_filename):
+    # Read the VHDL file and parse the context clause and entity header once for all generators
+    with instrumentation.phase('read'):
+        with open(vhdl_filename, 'r') as file:
+            vhdl_content = file.read()
+    with instrumentation.phase('parse'):
+        model = parse_vhdl(vhdl_content)
+    if instrumentation.active:
+        instrumentation.count('files parsed')
+        instrumentation.count('bytes read', len(vhdl_content))
+        instrumentation.count('ports parsed', len(model.ports))
+    return vhdl_content, model
+
+def generate_testbench(vhdl_filename, package_filename=None, output_dir=SIMULATION_DIR, type_index=None, model=None):
+    """Write or update the testbench of one VHDL file. Returns its path, or None without an entity.
+
+    An already parsed model (watch mode) avoids reading the source again.
+    """
+    if type_index is None and package_filename:
+        with instrumentation.phase('index'):
+            type_index = load_type_index([package_filename, vhdl_filename], output_dir)
+
+    if model is None:
+        vhdl_content, model = read_model(vhdl_filename)
+    else:
+        vhdl_content = None
 
     # Extract libraries and use statements
-    libraries, uses = extract_libraries(vhdl_content)
+    libraries, uses = extract_libraries(model)
 
     # Construct the libraries and use declaration for inclusion in the testbench
     libraries_declaration = '\n'.join([f"library {lib};" for lib in libraries])
@@ -212,46 +294,223 @@ def main():
     # Create an empty set to keep track of processed record types
     processed_record_types = set()
     # Extract generics
-    generics = extract_generics(vhdl_content)
+    generics = extract_generics(model)
     # Extract ports
-    ports = extract_ports(vhdl_content)
+    ports = extract_ports(model)
     
-    # Convert generics to generic map
-    generic_maps = [create_generic_map(generic) for generic in generics if generic.strip()]
-    # Convert ports to signals and create port map
-    signals = [convert_to_signal(port, vhdl_content, processed_record_types, package_filename) for port in ports]
-    port_maps = [create_port_map(port) for port in ports]
-    entity_name = extract_entity_name(vhdl_content)
+    with instrumentation.phase('convert'):
+        # Convert generics to generic map
+        generic_maps = [create_generic_map(generic) for generic in generics if generic.strip()]
+        # Convert ports to signals and create port map
+        signals = [convert_to_signal(port, vhdl_content, processed_record_types, package_filename, type_index) for port in ports]
+        port_maps = [create_port_map(port) for port in ports]
+    entity_name = extract_entity_name(model)
     if not entity_name:
-        print("Error: Unable to extract entity name from VHDL file.")
-        return
+        print(f"Error: Unable to extract entity name from VHDL file {vhdl_filename}.")
+        return None
 
     component_declaration = create_component_declaration(generics, ports, entity_name)
-     # Extract filename without the extension
     vhdl_base_filename = os.path.splitext(os.path.basename(vhdl_filename))[0]
-    # Construct testbench with tb_prefix
-    testbench_filename = f"tb_{vhdl_base_filename}.vhd"
-    # Combine with the desired relative path
-    testbench_filepath = os.path.join("simulation",testbench_filename)
+    testbench_filepath = testbench_path(vhdl_filename, output_dir)
 
+    os.makedirs(output_dir, exist_ok=True)
+    existing_content = None
     if os.path.exists(testbench_filepath):
         # Read the existing testbench file
         with open(testbench_filepath, 'r') as existing_file:
             existing_content = existing_file.read()
 
-        # Update the necessary parts in the testbench content
-        updated_content = update_testbench_content(existing_content, ports, generics, libraries_declaration, uses_declaration, vhdl_base_filename, signals, component_declaration, generic_maps, entity_name, port_maps)
-        # Save the testbench content to a file
-        with open(testbench_filepath, 'w') as file:
-            file.write(updated_content)
+    # Stream the updated testbench content to the file, replacing it only if it changed
+    sections = testbench_sections(existing_content or "", ports, generics, libraries_declaration, uses_declaration, vhdl_base_filename, signals, component_declaration, generic_maps, entity_name, port_maps)
+    with instrumentation.phase('write'):
+        size, replaced = write_testbench(testbench_filepath, sections, existing_content)
+    if existing_content is None:
+        print(f"Testbench written to {testbench_filepath}!")
+    elif replaced:
         print(f"Testbench updated at {testbench_filepath}!")
     else:
-        # Create the testbench content from scratch
-        updated_content = update_testbench_content("", ports, generics, libraries_declaration, uses_declaration, vhdl_base_filename, signals, component_declaration, generic_maps, entity_name, port_maps)
-         # Save the testbench content to a file
-        with open(testbench_filepath, 'w') as file:
-            file.write(updated_content)
-        print(f"Testbench written to {testbench_filepath}!")
+        print(f"Testbench unchanged at {testbench_filepath}.")
+    if instrumentation.active and replaced:
+        instrumentation.count('testbenches written')
+        instrumentation.count('bytes written', size)
+    return testbench_filepath
+
+#### Batch mode ####
+def file_hash(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def generator_hash():
+    """Hash of the template and the --default rules, the inputs of a testbench besides its sources."""
+    rules = sorted((mark, rule if isinstance(rule, str) else f"{rule.__module__}.{rule.__qualname__}")
+                   for mark, rule in vhdl_types.registered_defaults().items())
+    return hashlib.sha256(json.dumps([TEMPLATE_HASH, rules]).encode()).hexdigest()
+
+def load_state(state_file):
+    state = json_store.load_json(state_file)
+    return state if isinstance(state, dict) else {}
+
+def save_state(state_file, state):
+    json_store.save_json(state_file, state, indent=1, sort_keys=True)
+
+# Type indexes loaded by pool workers, one per index file and process
+_worker_type_indexes = {}
+
+def _init_worker(default_rules):
+    # Process pool initializer; rules are registered once per worker, not per task
+    for type_name, rule in default_rules.items():
+        vhdl_types.register_default(type_name, rule)
+
+def _generate_testbench_task(task):
+    # Process pool entry point; workers read the index saved by run_batch
+    vhdl_filename, package_filename, output_dir, index_file = task
+    if index_file not in _worker_type_indexes:
+        _worker_type_indexes[index_file] = TypeIndex(index_file)
+    type_index = _worker_type_indexes[index_file]
+    return vhdl_filename, _generate_batch_testbench(vhdl_filename, package_filename, output_dir, type_index)
+
+def _generate_batch_testbench(vhdl_filename, package_filename, output_dir, type_index):
+    # Package-only sources are in the batch for their declarations; they get no testbench
+    model = read_model(vhdl_filename)[1]
+    if not model.name:
+        return None
+    return generate_testbench(vhdl_filename, package_filename, output_dir, type_index, model)
+
+def run_batch(vhdl_files, package_filename=None, jobs=1, output_dir=SIMULATION_DIR, force=False, index_paths=()):
+    """Generate testbenches for many VHDL files in one run.
+
+    Types are resolved through a persistent index of the package, the extra
+    index_paths and all batch sources. A file is skipped when its source hash, the hash of the
+    indexed declarations, the generator hash (template and --default rules)
+    and the hash of its existing testbench all match the state recorded by the
+    previous run.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state_file = os.path.join(output_dir, STATE_FILENAME)
+    state = load_state(state_file)
+    with instrumentation.phase('index'):
+        type_index = load_type_index(([package_filename] if package_filename else []) + list(index_paths) + list(vhdl_files), output_dir)
+        package_hash = type_index.fingerprint()
+    generator = generator_hash()
+
+    todo = []
+    source_hashes = {}
+    skipped = 0
+    with instrumentation.phase('hash'):
+        for vhdl_filename in vhdl_files:
+            source_hash = file_hash(vhdl_filename)
+            source_hashes[vhdl_filename] = source_hash
+            entry = state.get(vhdl_filename)
+            if (not force and entry and entry['source'] == source_hash and entry['package'] == package_hash
+                    and entry.get('generator') == generator and entry['testbench'] == file_hash(testbench_path(vhdl_filename, output_dir))):
+                skipped += 1
+                continue
+            todo.append((vhdl_filename, package_filename, output_dir, type_index.index_file))
+    instrumentation.count('files walked', len(vhdl_files))
+
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(vhdl_types.registered_defaults(),)) as executor:
+            results = list(executor.map(_generate_testbench_task, todo))
+    else:
+        results = [(task[0], _generate_batch_testbench(task[0], package_filename, output_dir, type_index)) for task in todo]
+
+    for vhdl_filename, testbench_filepath in results:
+        # Files without an entity are recorded too, so they are not re-parsed every run
+        state[vhdl_filename] = {
+            'source': source_hashes[vhdl_filename],
+            'package': package_hash,
+            'generator': generator,
+            'testbench': file_hash(testbench_filepath),
+        }
+    save_state(state_file, state)
+    print(f"{len(results)} files processed, {skipped} unchanged skipped.")
+
+#### Watch mode ####
+def watch(paths, package_filename=None, output_dir=SIMULATION_DIR, interval=0.2):
+    """Regenerate the testbenches of changed VHDL files until interrupted.
+
+    Parsed entity models and the type index stay in memory. A changed source
+    only regenerates its own testbench; a change to the indexed declarations
+    regenerates all testbenches from the models in memory.
+    """
+    package_paths = [package_filename] if package_filename else []
+
+    def list_sources():
+        return collect_sources(paths, output_dir, testbenches=False)
+
+    def list_files():
+        return sorted(set(list_sources()) | set(collect_sources(package_paths)))
+
+    run_batch(list_sources(), package_filename, output_dir=output_dir)
+    type_index = load_type_index(package_paths + list_sources(), output_dir)
+    models = {vhdl_filename: read_model(vhdl_filename)[1] for vhdl_filename in list_sources()}
+    print(f"Watching {len(models)} VHDL files, press Ctrl+C to stop.")
+
+    for changed, removed in PollingWatcher(list_files, interval).changes():
+        fingerprint = type_index.fingerprint()
+        if type_index.update(changed) or removed:
+            type_index.save()
+        sources = set(list_sources())
+        for vhdl_filename in removed:
+            models.pop(vhdl_filename, None)
+        regenerate = set()
+        for vhdl_filename in changed & sources:
+            try:
+                models[vhdl_filename] = read_model(vhdl_filename)[1]
+            except OSError:
+                # Deleted or renamed since the poll (atomic save, checkout): same as removed
+                models.pop(vhdl_filename, None)
+                continue
+            regenerate.add(vhdl_filename)
+        if type_index.fingerprint() != fingerprint:
+            regenerate.update(models)
+        for vhdl_filename in sorted(regenerate):
+            if models[vhdl_filename].name:
+                generate_testbench(vhdl_filename, package_filename, output_dir, type_index, models[vhdl_filename])
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate VHDL testbench.")
+    parser.add_argument("vhdl_filename", nargs="*", help="Path to the VHDL file. Several files or directories run in batch mode.")
+    parser.add_argument("--package", help = "Path to the VHDL package file, or a directory of packages to index.")
+    parser.add_argument("--file-list", help="Text file listing VHDL files or directories, one per line (batch mode).")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes in batch mode.")
+    parser.add_argument("--force", action="store_true", help="Regenerate unchanged testbenches in batch mode.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and regenerate testbenches when VHDL files change.")
+    parser.add_argument("--interval", type=float, default=0.2, help="Polling interval in seconds for --watch.")
+    parser.add_argument("--default", action="append", default=[], metavar="TYPE=VALUE", help="Default value of signals of TYPE, repeatable (e.g. state_t=IDLE).")
+    instrumentation.add_arguments(parser)
+    
+    args = parser.parse_args()
+
+    paths = list(args.vhdl_filename)
+    if args.file_list:
+        with open(args.file_list, 'r') as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    if not paths:
+        print("usage: script_testbench.py <your_vhdl_file> --package <your_package_file> ")
+        return
+    if args.jobs < 1:
+        parser.error("--jobs must be positive")
+    for rule in args.default:
+        try:
+            vhdl_types.register_default(*vhdl_types.parse_default_rule(rule))
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.watch:
+        try:
+            watch(paths, args.package, interval=args.interval)
+        except KeyboardInterrupt:
+            pass
+    else:
+        with instrumentation.profiling(args):
+            if len(paths) == 1 and not args.file_list and not os.path.isdir(paths[0]):
+                generate_testbench(paths[0], args.package)
+            else:
+                run_batch(collect_sources(paths, SIMULATION_DIR, testbenches=False), args.package, args.jobs, force=args.force)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
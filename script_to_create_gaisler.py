@@ -1,4 +1,29 @@
+import os
+import json
+import string
+import hashlib
+import argparse
+import functools
+
+import instrumentation
+import packet_registry
+import script_testbench
+from vhdl_index import TypeIndex
+
+GAISLER_STATE_FILENAME = ".gaisler_state.json"
+
+# The combinational logic between these markers survives a regeneration
+LOGIC_START_MARKER = "-- combinational logic starts here."
+LOGIC_END_MARKER = "-- combinational logic ends here."
+DEFAULT_LOGIC = "    -- Add your combinational logic here"
+
 def generate_vhdl_template(entity_name):
+    with instrumentation.phase('template'):
+        vhdl_template = render_template(entity_name)
+    instrumentation.count('templates generated')
+    return vhdl_template
+
+def render_template(entity_name):
     vhdl_template = f"""
 library ieee;
 use ieee.std_logic_1164.all;
@@ -41,18 +66,299 @@ end {entity_name}_arch;
 
     return vhdl_template
 
-if __name__ == "__main__":
-    entity_name = "entity_name" # we can add our entity name here
+#### Spec-driven scaffolding ####
+# A spec file lists entities under 'entities' (JSON, TOML or YAML, see packet_registry.load_definitions):
+#
+#   {"entities": [
+#       {"name": "uart_rx",
+#        "generics": [{"name": "DIVISOR", "type": "natural", "default": "16"}],
+#        "ports": [{"name": "rx", "mode": "in", "type": "std_logic"}],
+#        "inputs": [{"name": "enable", "type": "std_logic"}],
+#        "outputs": [{"name": "data", "type": "std_logic_vector(7 downto 0)"}],
+#        "registers": [{"name": "data", "type": "std_logic_vector(7 downto 0)"},
+#                      {"name": "count", "type": "unsigned(3 downto 0)", "reset": "x\"F\""}]}
+#   ]}
+#
+# inputs/outputs become the <name>_in_type/<name>_out_type records of <name>_pkg,
+# registers the reg_type of the architecture. Reset values default to the
+# type defaults of vhdl_index; outputs named like a register are driven by it.
 
-    # Define input and output records
-    input_record = """
-    """
-    output_record = """
+PACKAGE_TEMPLATE = """library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+{context}
+package {name}_pkg is
+{types}
+end package {name}_pkg;
+"""
+
+ENTITY_TEMPLATE = """library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+{context}use work.{name}_pkg.all;
+
+entity {name} is
+{generics}  port (
+{ports}
+  );
+end {name};
+
+architecture {name}_arch of {name} is
+  -- Record type definition
+  type reg_type is record
+{register_fields}
+  end record;
+  constant RES : reg_type := (
+{register_resets}
+  );
+  signal r, rin : reg_type;
+
+begin
+  -- Combinational process
+  comb : process({sensitivity})
+    variable v : reg_type;
+  begin
+    v := r; -- default assignment
+{logic_start}
+{logic}
+{logic_end}
+    if {reset} = '0' then
+      v := RES;
+    end if;
+    rin <= v;
+{outputs}
+  end process comb;
+
+  -- Sequential process
+  seq : process({clock})
+  begin
+    if rising_edge({clock}) then
+      r <= rin;
+    end if;
+  end process seq;
+
+end {name}_arch;
+"""
+
+# Specs are regenerated when the templates change
+TEMPLATE_HASH = hashlib.sha256((PACKAGE_TEMPLATE + ENTITY_TEMPLATE).encode()).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def compile_template(template):
+    """Split a str.format style template into (literal, field) pieces once."""
+    return tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(template))
+
+def render(template, values):
+    return ''.join(literal + (values[field] if field is not None else '') for literal, field in compile_template(template))
+
+def field_default(field, type_index, source):
+    value = field.get('reset', field.get('default'))
+    if value is None:
+        value = type_index.default_value(field['type'])
+    if value is None:
+        raise ValueError(f"{source}: '{field['name']}' of type '{field['type']}' needs a 'reset' value")
+    return str(value)
+
+def check_fields(entity, key, source, required=False):
+    fields = entity.get(key, [])
+    if required and not fields:
+        raise ValueError(f"{source}: entity '{entity['name']}' needs at least one of '{key}'")
+    names = set()
+    for field in fields:
+        if not field.get('name') or not field.get('type'):
+            raise ValueError(f"{source}: entity '{entity['name']}' has an entry of '{key}' without a name or a type")
+        if field['name'].lower() in names:
+            raise ValueError(f"{source}: entity '{entity['name']}' defines '{field['name']}' twice in '{key}'")
+        names.add(field['name'].lower())
+    return fields
+
+def record_type(type_name, fields, type_index, source):
+    """Record type declaration plus its *_none constant, used as the testbench default."""
+    lines = [f"  type {type_name} is record"]
+    lines.extend(f"    {field['name']} : {field['type']};" for field in fields)
+    lines.append("  end record;")
+    resets = ',\n'.join(f"    {field['name']} => {field_default(field, type_index, source)}" for field in fields)
+    constant = type_name[:-len('_type')] if type_name.endswith('_type') else type_name
+    lines.append(f"  constant {constant}_none : {type_name} := (\n{resets}\n  );")
+    return '\n'.join(lines)
+
+def context_clause(entity):
+    lines = [f"library {library};" for library in entity.get('libraries', [])]
+    lines.extend(f"use {use};" for use in entity.get('uses', []))
+    return ''.join(line + '\n' for line in lines)
+
+def preserved_logic(existing_content):
+    start_index = existing_content.find(LOGIC_START_MARKER)
+    end_index = existing_content.find(LOGIC_END_MARKER)
+    if start_index == -1 or end_index == -1:
+        return None
+    return existing_content[start_index + len(LOGIC_START_MARKER):end_index].strip('\n').rstrip()
+
+def render_entity(entity, type_index, source='<spec>', existing_content=""):
+    """Package and entity source of one spec entry, keeping the logic of existing_content."""
+    name = entity.get('name')
+    if not name:
+        raise ValueError(f"{source}: entity without a name")
+    inputs = check_fields(entity, 'inputs', source)
+    outputs = check_fields(entity, 'outputs', source)
+    registers = check_fields(entity, 'registers', source, required=True)
+    ports = check_fields(entity, 'ports', source)
+    generics = check_fields(entity, 'generics', source)
+    clock = entity.get('clock', 'clk')
+    reset = entity.get('reset', 'rstn')
+    context = context_clause(entity)
+
+    types = []
+    if inputs:
+        types.append(record_type(f"{name}_in_type", inputs, type_index, source))
+    if outputs:
+        types.append(record_type(f"{name}_out_type", outputs, type_index, source))
+    package = render(PACKAGE_TEMPLATE, {'name': name, 'context': context, 'types': '\n\n'.join(types)})
+
+    port_lines = [f"    {clock} : in std_logic", f"    {reset} : in std_logic"]
+    for port in ports:
+        port_lines.append(f"    {port['name']} : {port.get('mode', 'in')} {port['type']}")
+    if inputs:
+        port_lines.append(f"    d : in {name}_in_type")
+    if outputs:
+        port_lines.append(f"    q : out {name}_out_type")
+
+    generic_block = ""
+    if generics:
+        generic_lines = []
+        for generic in generics:
+            default = f" := {generic['default']}" if 'default' in generic else ""
+            generic_lines.append(f"    {generic['name']} : {generic['type']}{default}")
+        generic_block = "  generic (\n" + ';\n'.join(generic_lines) + "\n  );\n"
+
+    sensitivity = [reset] + [port['name'] for port in ports if port.get('mode', 'in') in ('in', 'inout')]
+    if inputs:
+        sensitivity.append('d')
+    sensitivity.append('r')
+
+    # Outputs named like a register are driven from it, the others from their default
+    register_names = {register['name'].lower() for register in registers}
+    output_lines = []
+    for field in outputs:
+        if field['name'].lower() in register_names:
+            output_lines.append(f"    q.{field['name']} <= r.{field['name']};")
+        else:
+            output_lines.append(f"    q.{field['name']} <= {field_default(field, type_index, source)};")
+    for port in ports:
+        if port.get('mode') in ('out', 'buffer'):
+            output_lines.append(f"    {port['name']} <= {field_default(port, type_index, source)};")
+
+    logic = preserved_logic(existing_content)
+    vhdl = render(ENTITY_TEMPLATE, {
+        'name': name,
+        'context': context,
+        'generics': generic_block,
+        'ports': ';\n'.join(port_lines),
+        'register_fields': '\n'.join(f"    {register['name']} : {register['type']};" for register in registers),
+        'register_resets': ',\n'.join(f"    {register['name']} => {field_default(register, type_index, source)}" for register in registers),
+        'sensitivity': ', '.join(sensitivity),
+        'logic_start': "    " + LOGIC_START_MARKER,
+        'logic': DEFAULT_LOGIC if logic is None else logic,
+        'logic_end': "    " + LOGIC_END_MARKER,
+        'reset': reset,
+        'clock': clock,
+        'outputs': '\n'.join(output_lines),
+    })
+    return package, vhdl
+
+def spec_hash(entity):
+    return hashlib.sha256(json.dumps([TEMPLATE_HASH, entity], sort_keys=True).encode()).hexdigest()
+
+def generate_from_specs(spec_files, output_dir='.', testbench_dir=None, jobs=1, force=False, testbenches=True):
+    """Write the package and entity of every spec entry, then their testbenches.
+
+    An entity whose spec (and the templates) did not change since its files
+    were written is not rewritten, so edits to those files are kept until
+    the spec changes. Returns the number of entities written.
     """
+    os.makedirs(output_dir, exist_ok=True)
+    state_file = os.path.join(output_dir, GAISLER_STATE_FILENAME)
+    state = script_testbench.load_state(state_file)
+    type_index = TypeIndex()
+
+    entities = {}
+    for spec_file in spec_files:
+        for entity in packet_registry.load_definitions(spec_file, 'entities'):
+            if entity.get('name') in entities:
+                raise ValueError(f"{spec_file}: entity '{entity['name']}' is defined twice")
+            entities[entity.get('name')] = (entity, spec_file)
+
+    written = 0
+    packages = []
+    sources = []
+    for name, (entity, spec_file) in entities.items():
+        package_path = os.path.join(output_dir, f"{name}_pkg.vhd")
+        entity_path = os.path.join(output_dir, f"{name}.vhd")
+        packages.append(package_path)
+        sources.append(entity_path)
+        digest = spec_hash(entity)
+        entry = state.get(name)
+        if not force and entry and entry['spec'] == digest and os.path.exists(package_path) and os.path.exists(entity_path):
+            continue
+        existing_content = ""
+        if os.path.exists(entity_path):
+            with open(entity_path, 'r') as f:
+                existing_content = f.read()
+        with instrumentation.phase('template'):
+            package, vhdl = render_entity(entity, type_index, spec_file, existing_content)
+        with instrumentation.phase('write'):
+            for path, content in ((package_path, package), (entity_path, vhdl)):
+                with open(path, 'w') as f:
+                    f.write(content)
+        instrumentation.count('templates generated')
+        instrumentation.count('bytes written', len(package) + len(vhdl))
+        state[name] = {'spec': digest}
+        written += 1
+        print(f"Entity {name} written to {entity_path}")
+
+    script_testbench.save_state(state_file, state)
+    print(f"{written} entities written, {len(entities) - written} unchanged skipped.")
+    if testbenches:
+        # The testbench writer skips sources whose testbench is up to date on its own
+        if testbench_dir is None:
+            testbench_dir = os.path.join(output_dir, script_testbench.SIMULATION_DIR)
+        script_testbench.run_batch(sources, None, jobs, testbench_dir, force, packages)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a two-process VHDL entity template.")
+    parser.add_argument("entity_name", nargs="?", default="entity_name", help="Name of the entity.")
+    parser.add_argument("--spec", action="append", default=[], help="Spec file of entities to generate with their testbenches (repeatable).")
+    parser.add_argument("--output-dir", default=".", help="Directory of the generated entities and packages in spec mode.")
+    parser.add_argument("--testbench-dir", default=None, help="Directory of the generated testbenches (default: OUTPUT_DIR/simulation).")
+    parser.add_argument("--no-testbench", action="store_true", help="Only generate the entities and packages in spec mode.")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for the testbenches in spec mode.")
+    parser.add_argument("--force", action="store_true", help="Regenerate unchanged specs.")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    entity_name = args.entity_name # we can add our entity name here
+
+    if args.spec:
+        if args.jobs < 1:
+            parser.error("--jobs must be positive")
+        with instrumentation.profiling(args):
+            try:
+                generate_from_specs(args.spec, args.output_dir, args.testbench_dir, args.jobs, args.force, not args.no_testbench)
+            except (ValueError, OSError) as e:
+                parser.error(str(e))
+    else:
+        # Define input and output records
+        input_record = """
+        """
+        output_record = """
+        """
 
-    vhdl_code = generate_vhdl_template(entity_name)
+        with instrumentation.profiling(args):
+            vhdl_code = generate_vhdl_template(entity_name)
 
-    with open(f"{entity_name}.vhd", "w") as vhdl_file:
-        vhdl_file.write(vhdl_code)
+            with instrumentation.phase('write'):
+                with open(f"{entity_name}.vhd", "w") as vhdl_file:
+                    vhdl_file.write(vhdl_code)
+            instrumentation.count('bytes written', len(vhdl_code))
 
-    print(f"VHDL template with record types, processes, and default assignment saved as {entity_name}.vhd")
+        print(f"VHDL template with record types, processes, and default assignment saved as {entity_name}.vhd")
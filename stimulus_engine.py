@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Constrained-random, coverage-driven packet stimulus.
+
+Constraints and coverage goals are read from the structure definition (see
+packet_registry.py). Per field, next to 'policy':
+
+    "range": [lo, hi]                       allowed values
+    "weights": [{"value": 0, "weight": 5},
+                {"range": [1, 9], "weight": 1}]   weighted distribution
+
+Per structure:
+
+    "rules": [{"if": {"Replay Flag": 1}, "then": {"VC Frame Count Usage Flag": 1}}]
+    "coverage": {"fields": {"VC Frame Count": ["zero", "ones", "min", "max", [1, 15]]},
+                 "cross": [["Replay Flag", "VC Frame Count Usage Flag"]],
+                 "goal": 100}
+
+'then' values are integers, {"range": [lo, hi]} or {"field": "Other Field"}.
+Bins are "zero", "ones", "min"/"max" (bounds of the field range), "all"
+(every value, for fields up to 8 bits) or explicit [lo, hi] ranges.
+While bins are unhit, each packet is steered into one of them with
+probability `bias`; generation stops once the goal is met, or after
+MAX_STALLED_PACKETS packets in a row hit no new bin.
+"""
+
+import random
+import itertools
+
+MAX_ALL_BIN_WIDTH = 8
+DEFAULT_FIELD_BINS = ('zero', 'ones', 'min', 'max')
+MAX_TARGET_ATTEMPTS = 50
+MAX_STALLED_PACKETS = 10000
+
+class FieldConstraint:
+    __slots__ = ('name', 'width', 'policy', 'lo', 'hi', 'weights', 'cumulative', 'value', 'start', 'step')
+
+    def __init__(self, name, width, spec):
+        self.name = name
+        self.width = width
+        self.policy = spec.get('policy', 'random')
+        mask = (1 << width) - 1
+        lo, hi = spec.get('range', (0, mask))
+        if not 0 <= lo <= hi <= mask:
+            raise ValueError(f"'{name}': range [{lo}, {hi}] does not fit in {width} bits")
+        self.lo, self.hi = lo, hi
+        self.value = spec.get('value')
+        self.start = spec.get('start', 0)
+        self.step = spec.get('step', 1)
+
+        # Weighted distribution as (lo, hi) choices with cumulative weights
+        self.weights = []
+        self.cumulative = []
+        total = 0
+        for entry in spec.get('weights', []):
+            choice_lo, choice_hi = entry['range'] if 'range' in entry else (entry['value'], entry['value'])
+            choice_lo, choice_hi = max(choice_lo, lo), min(choice_hi, hi)
+            if choice_lo > choice_hi or entry.get('weight', 1) <= 0:
+                continue
+            total += entry.get('weight', 1)
+            self.weights.append((choice_lo, choice_hi))
+            self.cumulative.append(total)
+
+    def draw(self, rng, index):
+        if self.policy == 'fixed':
+            return self.value
+        if self.policy == 'counter':
+            return (self.start + self.step * index) % (1 << self.width)
+        if self.weights:
+            lo, hi = rng.choices(self.weights, cum_weights=self.cumulative)[0]
+            return rng.randint(lo, hi)
+        if self.lo == 0 and self.hi == (1 << self.width) - 1:
+            return rng.getrandbits(self.width)
+        return rng.randint(self.lo, self.hi)
+
+    def can_target(self):
+        # Fixed and counter fields cannot be steered into a bin
+        return self.policy not in ('fixed', 'counter', 'manual')
+
+class CoverageModel:
+    """Coverage bins over single fields and field crosses."""
+
+    def __init__(self, spec, constraints):
+        self.goal = spec.get('goal', 100)
+        self.field_bins = {}
+        for field, bins in spec.get('fields', {}).items():
+            if field not in constraints:
+                raise ValueError(f"coverage field '{field}' is not a field of the structure")
+            self.field_bins[field] = self.make_bins(constraints[field], bins or DEFAULT_FIELD_BINS)
+        self.crosses = []
+        for fields in spec.get('cross', []):
+            for field in fields:
+                if field not in self.field_bins:
+                    # Fields only used in a cross get the default bins
+                    if field not in constraints:
+                        raise ValueError(f"cross field '{field}' is not a field of the structure")
+                    self.field_bins[field] = self.make_bins(constraints[field], DEFAULT_FIELD_BINS)
+            self.crosses.append(tuple(fields))
+
+        # Every coverage point is a key: (field, bin) or (cross fields, bin tuple)
+        self.hits = {}
+        for field, bins in self.field_bins.items():
+            for label in bins:
+                self.hits[(field, label)] = 0
+        for fields in self.crosses:
+            for labels in itertools.product(*(self.field_bins[field] for field in fields)):
+                self.hits[(fields, labels)] = 0
+        self.unreachable = set()
+        self.attempts = {}
+
+    @staticmethod
+    def make_bins(constraint, bins):
+        """Resolve bin specs to an ordered {label: (lo, hi)} within the field range."""
+        mask = (1 << constraint.width) - 1
+        resolved = {}
+        for entry in bins:
+            if entry == 'zero':
+                bounds = (0, 0)
+            elif entry == 'ones':
+                bounds = (mask, mask)
+            elif entry == 'min':
+                bounds = (constraint.lo, constraint.lo)
+            elif entry == 'max':
+                bounds = (constraint.hi, constraint.hi)
+            elif entry == 'all':
+                if constraint.width > MAX_ALL_BIN_WIDTH:
+                    raise ValueError(f"'all' bins need a field of at most {MAX_ALL_BIN_WIDTH} bits")
+                for value in range(constraint.lo, constraint.hi + 1):
+                    resolved.setdefault(str(value), (value, value))
+                continue
+            else:
+                bounds = tuple(entry)
+            lo, hi = max(bounds[0], constraint.lo), min(bounds[1], constraint.hi)
+            if lo > hi:
+                continue # Outside the allowed range, can never be hit
+            label = entry if isinstance(entry, str) else f"[{bounds[0]}, {bounds[1]}]"
+            # min/max often coincide with zero/ones; keep one bin per range
+            if (lo, hi) not in resolved.values():
+                resolved[label] = (lo, hi)
+        return resolved
+
+    def bins_of(self, field, value):
+        return [label for label, (lo, hi) in self.field_bins[field].items() if lo <= value <= hi]
+
+    def sample(self, values):
+        """Record the bins hit by one packet. Returns the number of newly hit bins."""
+        new = 0
+        field_hits = {field: self.bins_of(field, values[field]) for field in self.field_bins}
+        for field, labels in field_hits.items():
+            for label in labels:
+                key = (field, label)
+                if self.hits[key] == 0:
+                    new += 1
+                self.hits[key] += 1
+        for fields in self.crosses:
+            for labels in itertools.product(*(field_hits[field] for field in fields)):
+                key = (fields, labels)
+                if self.hits[key] == 0:
+                    new += 1
+                self.hits[key] += 1
+        return new
+
+    def unhit(self):
+        return [key for key, count in self.hits.items() if count == 0 and key not in self.unreachable]
+
+    def percent(self):
+        reachable = len(self.hits) - len(self.unreachable)
+        if reachable == 0:
+            return 100.0
+        hit = sum(1 for key, count in self.hits.items() if count and key not in self.unreachable)
+        return 100.0 * hit / reachable
+
+    def done(self):
+        return self.percent() >= self.goal
+
+    def report(self):
+        """Lines describing the hit count of every coverage point."""
+        lines = []
+        for key, count in self.hits.items():
+            name, label = key
+            state = 'unreachable' if key in self.unreachable else f"{count} hits"
+            if isinstance(name, tuple):
+                name = ' x '.join(name)
+                label = ' x '.join(label)
+            lines.append(f"{name} [{label}]: {state}")
+        return lines
+
+class StimulusEngine:
+    """Draw packets under the structure constraints and steer them into unhit bins."""
+
+    def __init__(self, structure, rng=None, bias=0.5, manual_values=None):
+        self.structure = structure
+        self.rng = rng or random.Random()
+        self.bias = bias
+        policies = structure.get('policies', {})
+        self.constraints = {}
+        for field, width in structure['fields'].items():
+            spec = dict(policies.get(field, {}))
+            if manual_values and field in manual_values:
+                spec = {'policy': 'manual', 'value': int(manual_values[field], 2)}
+            self.constraints[field] = FieldConstraint(field, width, spec)
+        for field, constraint in self.constraints.items():
+            if constraint.policy == 'manual' and constraint.value is None:
+                raise ValueError(f"manual field '{field}' needs a value")
+        self.rules = structure.get('rules', [])
+        for rule in self.rules:
+            self.check_rule(rule)
+        self.coverage = CoverageModel(structure.get('coverage', {}), self.constraints)
+        # Packets drawn since the last one that hit a new bin
+        self.stalled = 0
+
+    def check_rule(self, rule):
+        """Raise ValueError if a rule names an unknown field or a value that does not fit its field."""
+        for part in ('if', 'then'):
+            for field, value in rule.get(part, {}).items():
+                if field not in self.constraints:
+                    raise ValueError(f"rule uses unknown field '{field}'")
+                mask = (1 << self.constraints[field].width) - 1
+                if isinstance(value, dict) and part == 'then' and 'range' in value:
+                    lo, hi = value['range']
+                    if not 0 <= lo <= hi <= mask:
+                        raise ValueError(f"rule range [{lo}, {hi}] of '{field}' does not fit in {self.constraints[field].width} bits")
+                elif isinstance(value, dict) and part == 'then' and 'field' in value:
+                    if value['field'] not in self.constraints:
+                        raise ValueError(f"rule uses unknown field '{value['field']}'")
+                elif not isinstance(value, int) or not 0 <= value <= mask:
+                    raise ValueError(f"rule value {value!r} of '{field}' does not fit in {self.constraints[field].width} bits")
+
+    def draw(self, index):
+        rng = self.rng
+        values = {}
+        for field, constraint in self.constraints.items():
+            values[field] = constraint.value if constraint.policy == 'manual' else constraint.draw(rng, index)
+        target = None
+        unhit = self.coverage.unhit()
+        if unhit and rng.random() < self.bias:
+            target = rng.choice(unhit)
+            self.steer(values, target)
+        self.apply_rules(values)
+        return values, target
+
+    def steer(self, values, target):
+        name, label = target
+        fields, labels = (name, label) if isinstance(name, tuple) else ((name,), (label,))
+        for field, field_label in zip(fields, labels):
+            constraint = self.constraints[field]
+            if constraint.can_target():
+                lo, hi = self.coverage.field_bins[field][field_label]
+                values[field] = self.rng.randint(lo, hi)
+
+    def apply_rules(self, values):
+        for rule in self.rules:
+            if all(values[field] == value for field, value in rule.get('if', {}).items()):
+                for field, value in rule.get('then', {}).items():
+                    if isinstance(value, dict) and 'range' in value:
+                        lo, hi = value['range']
+                        if not lo <= values[field] <= hi:
+                            values[field] = self.rng.randint(lo, hi)
+                    elif isinstance(value, dict) and 'field' in value:
+                        values[field] = values[value['field']] & ((1 << self.constraints[field].width) - 1)
+                    else:
+                        values[field] = value
+
+    def next_packet(self, index):
+        """Draw one packet ({field: int}) and record its coverage."""
+        values, target = self.draw(index)
+        self.stalled = 0 if self.coverage.sample(values) else self.stalled + 1
+        if target is not None and self.coverage.hits[target] == 0:
+            # A bin that rules or fixed fields keep out of reach must not block the goal
+            attempts = self.coverage.attempts.get(target, 0) + 1
+            self.coverage.attempts[target] = attempts
+            if attempts >= MAX_TARGET_ATTEMPTS:
+                self.coverage.unreachable.add(target)
+        return values
+
+    def generate(self, max_count=None, first_index=0):
+        """Yield packets until the coverage goal is met, coverage stalls or max_count packets were drawn."""
+        index = first_index
+        while max_count is None or index - first_index < max_count:
+            if self.coverage.hits and (self.coverage.done() or self.stalled >= MAX_STALLED_PACKETS):
+                return
+            yield self.next_packet(index)
+            index += 1
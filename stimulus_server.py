@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Serve generated packets to simulators over a Unix domain socket.
+
+Simulator-side readers (a cocotb driver using StimulusClient, or a C shim
+behind GHDL VHPIDIRECT) pull packed records on demand, so generation overlaps
+with simulation and no stimulus file is written. Protocol, integers
+little-endian:
+
+    on connect     server -> client  the binary packet file header (packet_file.py)
+    request        client -> server  uint32 N, packets wanted (0 closes the connection)
+    reply          server -> client  uint32 K <= N, then K packed records
+                                     (K == 0: the stream has ended)
+
+Records are packed by a background thread into a bounded queue of chunks.
+When the simulator stops pulling, the queue fills up and generation pauses
+(backpressure). Clients are served one at a time and continue the same
+stream. When a client disconnects before a reply was sent completely, the
+records of that reply go back to the front of the stream and the next client
+receives them first.
+"""
+
+import os
+import stat
+import queue
+import socket
+import struct
+import threading
+
+import packet_file
+from packet_codec import Packet, PacketLayout
+
+COUNT_FORMAT = '<I'
+COUNT_SIZE = struct.calcsize(COUNT_FORMAT)
+MAX_BATCH = 65536
+DEFAULT_PREFETCH = 4
+
+class PackedStream:
+    """Pack chunks of wire lines into records ahead of the readers, at most `prefetch` chunks."""
+
+    def __init__(self, chunks, header, prefetch=DEFAULT_PREFETCH):
+        self.header = header
+        self.record_bytes = header['record_bytes']
+        self.queue = queue.Queue(maxsize=prefetch)
+        self.stop = threading.Event()
+        self.current = memoryview(b'')
+        self.finished = False
+        self.thread = threading.Thread(target=self._produce, args=(chunks,), daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, chunks):
+        header = self.header
+        try:
+            for lines in chunks:
+                if not self._put(b''.join(packet_file.pack_record(line, header) for line in lines)):
+                    return
+        except BaseException as e:
+            self._put(e)
+            return
+        self._put(None)
+
+    def take(self, count):
+        """Up to count packed records; fewer only at the end of the stream."""
+        wanted = count * self.record_bytes
+        parts = []
+        while wanted and not self.ended():
+            if not self.current:
+                item = self.queue.get()
+                if item is None:
+                    self.finished = True
+                    break
+                if isinstance(item, BaseException):
+                    self.finished = True
+                    raise item
+                self.current = memoryview(item)
+            part = self.current[:wanted]
+            self.current = self.current[len(part):]
+            parts.append(part)
+            wanted -= len(part)
+        records = b''.join(parts)
+        return records, len(records) // self.record_bytes
+
+    def unread(self, records):
+        """Put records taken for a client that went away back in front of the stream."""
+        if records:
+            self.current = memoryview(records + self.current.tobytes())
+
+    def ended(self):
+        return self.finished and not self.current
+
+    def close(self):
+        self.stop.set()
+
+def recv_exact(conn, size):
+    data = b''
+    while len(data) < size:
+        part = conn.recv(size - len(data))
+        if not part:
+            return None
+        data += part
+    return data
+
+def serve_client(conn, stream, header_bytes, max_batch=MAX_BATCH):
+    """Answer the requests of one client. Returns the number of packets sent."""
+    sent = 0
+    conn.sendall(header_bytes)
+    while True:
+        request = recv_exact(conn, COUNT_SIZE)
+        if request is None:
+            return sent
+        (count,) = struct.unpack(COUNT_FORMAT, request)
+        if count == 0:
+            return sent
+        records, count = stream.take(min(count, max_batch))
+        try:
+            conn.sendall(struct.pack(COUNT_FORMAT, count))
+            if count == 0:
+                return sent
+            conn.sendall(records)
+        except (BrokenPipeError, ConnectionResetError):
+            stream.unread(records)
+            raise
+        sent += count
+
+def remove_socket(path):
+    # Only a stale socket may be replaced, never a regular file
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def serve(path, chunks, header, prefetch=DEFAULT_PREFETCH, max_batch=MAX_BATCH):
+    """Serve the chunks of wire lines on the Unix socket path until they end or Ctrl+C.
+
+    Returns the number of packets sent.
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("Unix domain sockets are not supported on this platform")
+    header_bytes = packet_file.encode_header(header)
+    stream = PackedStream(chunks, header, prefetch)
+    sent = 0
+    remove_socket(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        server.listen(1)
+        print(f"Serving {header['structure']} packets on {path}, press Ctrl+C to stop.")
+        while not stream.ended():
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    sent += serve_client(conn, stream, header_bytes, max_batch)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # The simulator went away; the next one continues the stream
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.close()
+        server.close()
+        remove_socket(path)
+    return sent
+
+class StimulusClient:
+    """Pull packets from a stimulus server, e.g. from a cocotb driver."""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile('rb')
+        self.header, _ = packet_file.read_header(self.reader)
+        self.layout = PacketLayout.from_header(self.header)
+        self.finished = False
+
+    def fetch(self, count):
+        """Up to count packed records as one bytes object; empty once the stream ended."""
+        if self.finished or count <= 0:
+            return b''
+        self.sock.sendall(struct.pack(COUNT_FORMAT, min(count, MAX_BATCH)))
+        (received,) = struct.unpack(COUNT_FORMAT, self.reader.read(COUNT_SIZE))
+        if received == 0:
+            self.finished = True
+            return b''
+        return self.reader.read(received * self.header['record_bytes'])
+
+    def lines(self, count):
+        """Up to count packets as '0'/'1' wire lines, the format of the text files."""
+        records = self.fetch(count)
+        size = self.header['record_bytes']
+        return [packet_file.unpack_record(records[i:i + size], self.header) for i in range(0, len(records), size)]
+
+    def packets(self, count):
+        return [Packet.from_wire(self.layout, line) for line in self.lines(count)]
+
+    def close(self):
+        if not self.finished:
+            try:
+                self.sock.sendall(struct.pack(COUNT_FORMAT, 0))
+            except OSError:
+                pass
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Persistent index of the types and constants declared in a VHDL project.
+
+The index is stored as JSON with one entry per source file (mtime, size and
+its declarations), so update() only re-parses files that changed. Lookups go
+through merged, lower-cased dictionaries built on load and are O(1).
+"""
+
+import os
+import json
+import hashlib
+
+import json_store
+
+from vhdl_parser import VHDL_EXTENSIONS, parse_declarations, type_mark
+from vhdl_types import default_value as builtin_default
+
+INDEX_VERSION = 1
+
+# Constants with one of these suffixes are used as the default of their type
+RESET_CONSTANT_SUFFIXES = ('_reset', '_rst', '_init', '_default', '_zero', '_none')
+
+def collect_sources(paths, skip_dir=None, testbenches=True):
+    """Expand files and directories into a sorted list of VHDL files.
+
+    Directories are walked recursively except skip_dir; walked tb_* files are
+    left out unless testbenches is set. Named files are kept if they exist.
+    """
+    sources = set()
+    skip_dir = os.path.realpath(skip_dir) if skip_dir else None
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                if skip_dir:
+                    dirs[:] = [d for d in dirs if os.path.realpath(os.path.join(root, d)) != skip_dir]
+                for file in files:
+                    if file.lower().endswith(VHDL_EXTENSIONS) and (testbenches or not file.startswith("tb_")):
+                        sources.add(os.path.join(root, file))
+        elif os.path.isfile(path):
+            sources.add(path)
+    return sorted(sources)
+
+class TypeIndex:
+    def __init__(self, index_file=None):
+        self.index_file = index_file
+        self.files = {}
+        self.types = {}
+        self.constants = {}
+        self.reset_constants = {}
+        if index_file:
+            self.files = json_store.load_versioned(index_file, INDEX_VERSION)
+        self._merge()
+
+    def _merge(self):
+        self.types = {}
+        self.constants = {}
+        self.reset_constants = {}
+        for path in sorted(self.files):
+            entry = self.files[path]
+            for name, definition in entry['types'].items():
+                self.types[name.lower()] = dict(definition, name=name)
+            for name, constant in entry['constants'].items():
+                self.constants[name.lower()] = dict(constant, name=name)
+                if constant['value'] is not None and name.lower().endswith(RESET_CONSTANT_SUFFIXES):
+                    mark = type_mark(constant['type'])
+                    if mark:
+                        self.reset_constants.setdefault(mark.lower(), name)
+
+    def update(self, paths):
+        """Re-parse the VHDL files under paths that changed since they were indexed.
+
+        Entries of indexed files that no longer exist are dropped, including
+        files deleted while the update runs.
+        Returns the number of entries changed: files parsed plus entries dropped.
+        """
+        parsed = 0
+        for path in collect_sources(paths):
+            try:
+                st = os.stat(path)
+                entry = self.files.get(path)
+                if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                    continue
+                with open(path, 'r', errors='replace') as f:
+                    types, constants = parse_declarations(f.read())
+            except OSError:
+                continue # Deleted since it was listed; its entry is dropped below
+            self.files[path] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'types': types, 'constants': constants}
+            parsed += 1
+        removed = [path for path in self.files if not os.path.exists(path)]
+        for path in removed:
+            del self.files[path]
+        if parsed or removed:
+            self._merge()
+        return parsed + len(removed)
+
+    def save(self):
+        if not self.index_file:
+            return
+        json_store.save_versioned(self.index_file, INDEX_VERSION, self.files)
+
+    def fingerprint(self):
+        """Hash of the indexed declarations; edits that do not touch a declaration keep it."""
+        declarations = [[path, entry['types'], entry['constants']] for path, entry in sorted(self.files.items())]
+        return hashlib.sha256(json.dumps(declarations, sort_keys=True).encode()).hexdigest()
+
+    def lookup(self, type_name):
+        return self.types.get(type_name.lower())
+
+    def default_value(self, data_type, resolved_types=None, _visiting=None):
+        """Default value expression for a port or signal of data_type, or None if unknown.
+
+        Record types use a *_reset/*_init style constant of the type when one
+        exists, otherwise an aggregate built from the field defaults. Names of
+        resolved record types are added to resolved_types.
+        """
+        mark = type_mark(data_type)
+        if not mark:
+            return None
+        # Standard types, range constraints and registered rules (vhdl_types.py)
+        value = builtin_default(data_type)
+        if value is not None:
+            return value
+        key = mark.lower()
+        definition = self.types.get(key)
+        if definition is None:
+            return None
+        visiting = _visiting if _visiting is not None else set()
+        if key in visiting:
+            return None
+        visiting.add(key)
+        try:
+            kind = definition['kind']
+            if kind == 'record':
+                if resolved_types is not None:
+                    resolved_types.add(definition['name'])
+                if key in self.reset_constants:
+                    return self.reset_constants[key]
+                parts = []
+                for field, field_type in definition['fields']:
+                    value = self.default_value(field_type, resolved_types, visiting)
+                    if value is None:
+                        return None
+                    parts.append(f"{field} => {value}")
+                return '(' + ', '.join(parts) + ')'
+            if kind == 'array':
+                value = self.default_value(definition['element'], resolved_types, visiting)
+                return None if value is None else f"(others => {value})"
+            if kind in ('enum', 'scalar'):
+                return f"{definition['name']}'left"
+            if kind == 'subtype':
+                value = self.default_value(definition['base'], resolved_types, visiting)
+                # A constrained integer subtype may not contain the base default
+                if value is not None and ' range ' in f" {definition['definition'].lower()} " and not value.startswith('('):
+                    return f"{definition['name']}'left"
+                return value
+            return None
+        finally:
+            visiting.discard(key)
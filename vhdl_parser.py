@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Single-pass VHDL lexer and entity header parser.
+
+tokenize() walks the source once with one master pattern; parse_vhdl()
+consumes the tokens lazily and stops at the end of the entity header, so a
+file costs time proportional to its size (and usually much less). The
+result is one EntityModel used by every testbench generator.
+"""
+
+import re
+from collections import namedtuple
+
+VHDL_EXTENSIONS = ('.vhd', '.vhdl')
+
+Token = namedtuple('Token', 'kind value start end')
+Port = namedtuple('Port', 'name mode type')
+Generic = namedtuple('Generic', 'name type default')
+
+class EntityModel:
+    __slots__ = ('name', 'libraries', 'uses', 'generics', 'ports')
+
+    def __init__(self):
+        self.name = None
+        self.libraries = []
+        self.uses = []
+        self.generics = []
+        self.ports = []
+
+PORT_MODES = ('in', 'out', 'inout', 'buffer', 'linkage')
+INTERFACE_CLASSES = ('signal', 'constant', 'variable')
+
+token_pattern = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<bitstring>\d*[uUsS]?[bBoOxXdD]"[^"\n]*")
+  | (?P<string>"(?:[^"\n]|"")*")
+  | (?P<number>\d[\d_]*(?:\#[0-9a-fA-F_.]+\#|\.[\d_]+)?(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z][A-Za-z0-9_]*|\\[^\\\n]*\\)
+  | (?P<delim>=>|<=|:=|>=|/=|\*\*|<>|\?\?|[()\[\];:,.&|+\-*/<>=@'])
+  | (?P<other>.)
+''', re.VERBOSE | re.DOTALL)
+
+def tokenize(text):
+    """Yield the significant tokens of text (whitespace and comments are dropped)."""
+    pos = 0
+    end = len(text)
+    previous = None
+    match = token_pattern.match
+    while pos < end:
+        # A tick after a name or ')' is an attribute, otherwise 'x' is a character literal
+        if text[pos] == "'" and pos + 2 < end and text[pos + 2] == "'" and not (
+                previous is not None and (previous.kind == 'ident' or previous.value == ')')):
+            token = Token('char', text[pos:pos + 3], pos, pos + 3)
+            pos += 3
+            previous = token
+            yield token
+            continue
+        m = match(text, pos)
+        kind = m.lastgroup
+        pos = m.end()
+        if kind == 'ws' or kind == 'comment':
+            continue
+        token = Token(kind, m.group(), m.start(), pos)
+        previous = token
+        yield token
+
+def join_tokens(tokens):
+    """Rebuild source text of tokens, collapsing whitespace and comments to one space."""
+    parts = []
+    last_end = None
+    for token in tokens:
+        if last_end is not None and token.start > last_end:
+            parts.append(' ')
+        parts.append(token.value)
+        last_end = token.end
+    return ''.join(parts)
+
+def is_keyword(token, *words):
+    return token is not None and token.kind == 'ident' and token.value.lower() in words
+
+def read_until(tokens, *stops):
+    """Collect tokens up to the first stop delimiter at parenthesis depth 0.
+
+    Returns (collected tokens, stop token or None at end of input).
+    """
+    collected = []
+    depth = 0
+    for token in tokens:
+        value = token.value
+        if depth == 0 and token.kind == 'delim' and value in stops:
+            return collected, token
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        collected.append(token)
+    return collected, None
+
+def split_top_level(tokens, separator):
+    """Split a token list on separator delimiters at parenthesis depth 0."""
+    groups = [[]]
+    depth = 0
+    for token in tokens:
+        value = token.value
+        if depth == 0 and token.kind == 'delim' and value == separator:
+            groups.append([])
+            continue
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        groups[-1].append(token)
+    return [group for group in groups if group]
+
+def parse_interface_list(tokens):
+    """Parse the inside of generic(...) or port(...) into (names, mode, type, default) entries."""
+    elements = []
+    for element in split_top_level(tokens, ';'):
+        if is_keyword(element[0], *INTERFACE_CLASSES):
+            element = element[1:]
+        names, rest = [], element
+        for i, token in enumerate(element):
+            if token.kind == 'delim' and token.value == ':':
+                names = [t.value for t in element[:i] if t.kind == 'ident']
+                rest = element[i + 1:]
+                break
+        mode = None
+        if rest and is_keyword(rest[0], *PORT_MODES):
+            mode = rest[0].value
+            rest = rest[1:]
+        default = None
+        for i, token in enumerate(rest):
+            if token.kind == 'delim' and token.value == ':=':
+                default = join_tokens(rest[i + 1:])
+                rest = rest[:i]
+                break
+        elements.append((names, mode, join_tokens(rest), default, element))
+    return elements
+
+def parse_entity_header(tokens, model):
+    """Parse from after 'entity NAME is' up to the end of the port clause."""
+    for token in tokens:
+        if is_keyword(token, 'generic', 'port'):
+            clause = token.value.lower()
+            opening = next(tokens, None)
+            if opening is None or opening.value != '(':
+                continue
+            body, closing = read_until(tokens, ')')
+            for names, mode, data_type, default, element in parse_interface_list(body):
+                if not names:
+                    continue
+                if clause == 'generic':
+                    model.generics.extend(Generic(name, data_type, default) for name in names)
+                else:
+                    model.ports.extend(Port(name, mode or 'in', data_type) for name in names)
+            if clause == 'port':
+                return
+        elif is_keyword(token, 'begin', 'end'):
+            return
+
+def parse_vhdl(text):
+    """Parse the context clause and the first entity header of a VHDL source."""
+    model = EntityModel()
+    tokens = tokenize(text)
+    for token in tokens:
+        if token.kind != 'ident':
+            continue
+        word = token.value.lower()
+        if word in ('library', 'use') and model.name is None:
+            clause, _ = read_until(tokens, ';')
+            if word == 'library':
+                model.libraries.extend(t.value for t in clause if t.kind == 'ident')
+            else:
+                model.uses.extend(join_tokens(group) for group in split_top_level(clause, ','))
+        elif word == 'entity':
+            name = next(tokens, None)
+            if name is None or name.kind != 'ident':
+                continue
+            keyword = next(tokens, None)
+            if not is_keyword(keyword, 'is'):
+                continue # Direct instantiation such as "entity work.foo"
+            model.name = name.value
+            parse_entity_header(tokens, model)
+            break
+    return model
+
+def generic_declaration(generic):
+    """Render a generic as the declaration string used by the code generators."""
+    declaration = f"{generic.name} : {generic.type}"
+    if generic.default is not None:
+        declaration += f" := {generic.default}"
+    return declaration
+
+def type_mark(subtype_indication):
+    """Type name of a subtype indication, e.g. 'work.pkg.word_t(7 downto 0)' -> 'word_t'.
+
+    A leading resolution function ('resolved std_ulogic') is skipped.
+    """
+    mark = None
+    for token in tokenize(subtype_indication):
+        if token.kind == 'ident':
+            if is_keyword(token, 'range', 'downto', 'to'):
+                break
+            mark = token.value
+        elif token.value != '.':
+            break
+    return mark
+
+def parse_record_fields(tokens):
+    """Parse record elements up to 'end record'. Returns [[name, type], ...]."""
+    fields = []
+    for token in tokens:
+        if is_keyword(token, 'end'):
+            read_until(tokens, ';')
+            break
+        element, _ = read_until(tokens, ';')
+        element.insert(0, token)
+        for names, _, data_type, _, _ in parse_interface_list(element):
+            fields.extend([name, data_type] for name in names)
+    return fields
+
+def parse_declarations(text):
+    """Collect type, subtype and constant declarations of a VHDL source.
+
+    Returns (types, constants): types maps each name to a JSON-friendly
+    definition with a 'kind' of record, enum, array, scalar, subtype or other;
+    constants maps each name to its type and value (None when deferred).
+    """
+    types = {}
+    constants = {}
+    tokens = tokenize(text)
+    for token in tokens:
+        if is_keyword(token, 'type', 'subtype'):
+            name = next(tokens, None)
+            keyword = next(tokens, None)
+            if name is None or name.kind != 'ident' or not is_keyword(keyword, 'is'):
+                continue # Incomplete type declaration or 'type' used in another context
+            first = next(tokens, None)
+            if first is None:
+                break
+            if token.value.lower() == 'subtype':
+                body, _ = read_until(tokens, ';')
+                body.insert(0, first)
+                definition = join_tokens(body)
+                types[name.value] = {'kind': 'subtype', 'base': type_mark(definition), 'definition': definition}
+            elif is_keyword(first, 'record'):
+                types[name.value] = {'kind': 'record', 'fields': parse_record_fields(tokens)}
+            elif first.value == '(':
+                body, _ = read_until(tokens, ')')
+                read_until(tokens, ';')
+                literals = [join_tokens(group) for group in split_top_level(body, ',')]
+                types[name.value] = {'kind': 'enum', 'literals': literals}
+            elif is_keyword(first, 'array'):
+                body, _ = read_until(tokens, ';')
+                element = []
+                for i, t in enumerate(body):
+                    if is_keyword(t, 'of'):
+                        element = body[i + 1:]
+                types[name.value] = {'kind': 'array', 'element': join_tokens(element), 'definition': join_tokens([first] + body)}
+            elif is_keyword(first, 'range'):
+                body, _ = read_until(tokens, ';')
+                types[name.value] = {'kind': 'scalar', 'definition': join_tokens([first] + body)}
+            elif is_keyword(first, 'protected'):
+                # Protected types end with 'end protected;' and contain their own declarations
+                for t in tokens:
+                    if is_keyword(t, 'end'):
+                        closing = next(tokens, None)
+                        if is_keyword(closing, 'protected'):
+                            break
+                read_until(tokens, ';')
+                types[name.value] = {'kind': 'other'}
+            else:
+                read_until(tokens, ';')
+                types[name.value] = {'kind': 'other'}
+        elif is_keyword(token, 'constant'):
+            body, _ = read_until(tokens, ';')
+            for names, _, data_type, value, _ in parse_interface_list(body):
+                for name in names:
+                    # Keep the full value of a deferred constant from the package body
+                    if value is not None or name not in constants:
+                        constants[name] = {'type': data_type, 'value': value}
+    return types, constants
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Classification of VHDL port types and their default values.
+
+A subtype indication is tokenized once into a TypeInfo: its lower-case type
+mark, its constraint (None, 'index' for 'unsigned(7 downto 0)' style or
+'range' for 'integer range 1 to 10') and the left bound of a range. Defaults
+come from a dispatch table keyed by type mark, built from BUILTIN_DEFAULTS
+plus the rules added with register_default.
+Both steps are cached per type string, so every port after the first one
+of a type costs one dictionary lookup.
+
+Types the table does not know (records, enums, project subtypes) are left to
+the package index (vhdl_index.py); default_value() returns None for them.
+"""
+
+import functools
+from collections import namedtuple
+
+from vhdl_parser import tokenize, is_keyword, join_tokens
+
+CACHE_SIZE = 4096
+
+# Default values of the standard types, keyed by lower-case type mark
+BUILTIN_DEFAULTS = {
+    'std_logic': "'0'",
+    'std_ulogic': "'0'",
+    'bit': "'0'",
+    'std_logic_vector': "(others => '0')",
+    'std_ulogic_vector': "(others => '0')",
+    'bit_vector': "(others => '0')",
+    'unsigned': "(others => '0')",
+    'signed': "(others => '0')",
+    'u_unsigned': "(others => '0')",
+    'u_signed': "(others => '0')",
+    'unresolved_unsigned': "(others => '0')",
+    'unresolved_signed': "(others => '0')",
+    'ufixed': "(others => '0')",
+    'sfixed': "(others => '0')",
+    'boolean': "false",
+    'integer': "0",
+    'natural': "0",
+    'positive': "1",
+    'real': "0.0",
+    'time': "0 ns",
+    'character': "NUL",
+    'string': "(others => ' ')",
+    'boolean_vector': "(others => false)",
+    'integer_vector': "(others => 0)",
+    'real_vector': "(others => 0.0)",
+}
+
+TypeInfo = namedtuple('TypeInfo', 'mark constraint left')
+
+# Type mark -> default expression, or a callable taking the TypeInfo
+_rules = dict(BUILTIN_DEFAULTS)
+# Marks of rules registered by the user; these win over range constraints
+_user_marks = set()
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def classify_type(data_type):
+    """TypeInfo of a subtype indication, e.g. 'ieee.numeric_std.unsigned(7 downto 0)'."""
+    tokens = iter(tokenize(data_type))
+    mark = None
+    token = next(tokens, None)
+    # A selected name, optionally after a resolution function ('resolved std_ulogic')
+    while token is not None and (token.value == '.' or (token.kind == 'ident' and not is_keyword(token, 'range'))):
+        if token.kind == 'ident':
+            mark = token.value.lower()
+        token = next(tokens, None)
+    if token is None:
+        return TypeInfo(mark, None, None)
+    if token.value == '(':
+        return TypeInfo(mark, 'index', None)
+    if is_keyword(token, 'range'):
+        # The left bound ends at the direction keyword; 'T'range' style ranges have none
+        bound = []
+        for token in tokens:
+            if is_keyword(token, 'to', 'downto'):
+                return TypeInfo(mark, 'range', join_tokens(bound) or None)
+            bound.append(token)
+        return TypeInfo(mark, 'range', None)
+    return TypeInfo(mark, None, None)
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def default_value(data_type):
+    """Default value expression of data_type, or None when the table does not know its type."""
+    info = classify_type(data_type)
+    if info.mark is None:
+        return None
+    rule = _rules.get(info.mark)
+    if info.mark not in _user_marks and info.constraint == 'range' and info.left is not None:
+        # The default of a range constrained scalar is its left bound, like T'left
+        return info.left
+    if callable(rule):
+        return rule(info)
+    return rule
+
+def register_default(type_name, rule):
+    """Use rule (an expression, or a callable taking the TypeInfo) as the default of type_name."""
+    mark = type_name.strip().lower()
+    _rules[mark] = rule
+    _user_marks.add(mark)
+    default_value.cache_clear()
+
+def registered_defaults():
+    """The rules added with register_default, e.g. to hand them to worker processes."""
+    return {mark: _rules[mark] for mark in _user_marks}
+
+def parse_default_rule(assignment):
+    """Split a TYPE=VALUE command line rule into (type name, value)."""
+    type_name, separator, value = assignment.partition('=')
+    if not separator or not type_name.strip() or not value.strip():
+        raise ValueError(f"Invalid default rule '{assignment}', expected TYPE=VALUE")
+    return type_name.strip(), value.strip()